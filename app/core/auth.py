@@ -1,30 +1,29 @@
-from app.core.db import get_conn
+from app.core.db import get_conn, writer
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets, time
 
 def ensure_users_table():
-    con = get_conn()
-    # Yeni kurulum için şema
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS users(
-          email TEXT PRIMARY KEY,
-          password_hash TEXT NOT NULL,
-          plan TEXT NOT NULL DEFAULT 'demo',
-          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-          reset_token TEXT,
-          reset_expires BIGINT
-        )
-    """)
-    # Eski tabloda reset kolonları yoksa ekle (migration)
-    try:
-        con.execute("ALTER TABLE users ADD COLUMN reset_token TEXT")
-    except Exception:
-        pass
-    try:
-        con.execute("ALTER TABLE users ADD COLUMN reset_expires BIGINT")
-    except Exception:
-        pass
-    con.close()
+    with writer() as con:
+        # Yeni kurulum için şema
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS users(
+              email TEXT PRIMARY KEY,
+              password_hash TEXT NOT NULL,
+              plan TEXT NOT NULL DEFAULT 'demo',
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              reset_token TEXT,
+              reset_expires BIGINT
+            )
+        """)
+        # Eski tabloda reset kolonları yoksa ekle (migration)
+        try:
+            con.execute("ALTER TABLE users ADD COLUMN reset_token TEXT")
+        except Exception:
+            pass
+        try:
+            con.execute("ALTER TABLE users ADD COLUMN reset_expires BIGINT")
+        except Exception:
+            pass
 
 
 def create_user(email: str, password: str, plan: str='demo') -> bool:
@@ -32,20 +31,17 @@ def create_user(email: str, password: str, plan: str='demo') -> bool:
     if not email or not password:
         return False
     ph = generate_password_hash(password)
-    con = get_conn()
-    try:
-        con.execute("INSERT INTO users(email, password_hash, plan) VALUES (?, ?, ?)", [email, ph, plan])
-        return True
-    except Exception:
-        return False
-    finally:
-        con.close()
+    with writer() as con:
+        try:
+            con.execute("INSERT INTO users(email, password_hash, plan) VALUES (?, ?, ?)", [email, ph, plan])
+            return True
+        except Exception:
+            return False
 
 def get_user(email: str):
     if not email: return None
-    con = get_conn(read_only=True)
-    row = con.execute("SELECT email, password_hash, plan FROM users WHERE email = ?", [email.strip().lower()]).fetchone()
-    con.close()
+    with get_conn(read_only=True) as con:
+        row = con.execute("SELECT email, password_hash, plan FROM users WHERE email = ?", [email.strip().lower()]).fetchone()
     if not row: return None
     return {"email": row[0], "password_hash": row[1], "plan": row[2]}
 
@@ -54,9 +50,8 @@ def verify_user(email: str, password: str) -> bool:
     return bool(u and check_password_hash(u["password_hash"], password))
 
 def set_plan(email: str, plan: str):
-    con = get_conn()
-    con.execute("UPDATE users SET plan=? WHERE email=?", [plan, (email or '').strip().lower()])
-    con.close()
+    with writer() as con:
+        con.execute("UPDATE users SET plan=? WHERE email=?", [plan, (email or '').strip().lower()])
 def create_reset_token(email: str) -> str | None:
     """
     Verilen email için random token üretir ve DB'ye yazar.
@@ -69,12 +64,11 @@ def create_reset_token(email: str) -> str | None:
     token = secrets.token_urlsafe(32)
     expires = int(time.time()) + 60 * 60  # 60 dakika
 
-    con = get_conn()
-    con.execute(
-        "UPDATE users SET reset_token = ?, reset_expires = ? WHERE email = ?",
-        [token, expires, email],
-    )
-    con.close()
+    with writer() as con:
+        con.execute(
+            "UPDATE users SET reset_token = ?, reset_expires = ? WHERE email = ?",
+            [token, expires, email],
+        )
     return token
 
 
@@ -86,12 +80,11 @@ def get_user_by_reset_token(token: str):
     if not token:
         return None
 
-    con = get_conn(read_only=True)
-    row = con.execute(
-        "SELECT email, reset_expires FROM users WHERE reset_token = ?",
-        [token],
-    ).fetchone()
-    con.close()
+    with get_conn(read_only=True) as con:
+        row = con.execute(
+            "SELECT email, reset_expires FROM users WHERE reset_token = ?",
+            [token],
+        ).fetchone()
 
     if not row:
         return None
@@ -112,14 +105,13 @@ def set_password_for_email(email: str, new_password: str) -> bool:
         return False
 
     ph = generate_password_hash(new_password)
-    con = get_conn()
-    con.execute(
-        """
-        UPDATE users
-        SET password_hash = ?, reset_token = NULL, reset_expires = NULL
-        WHERE email = ?
-        """,
-        [ph, email],
-    )
-    con.close()
+    with writer() as con:
+        con.execute(
+            """
+            UPDATE users
+            SET password_hash = ?, reset_token = NULL, reset_expires = NULL
+            WHERE email = ?
+            """,
+            [ph, email],
+        )
     return True
@@ -1,138 +1,576 @@
 # app/core/db.py
 import duckdb
+import hashlib
+import json
 import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from app.core.trend_core import (
+    JUNK_MASK, TERM_FORMULA, TERM_NO_LETTERS, TERM_NUMERIC, TERM_SHORT, TERM_UNCASED, sniff_week_csv,
+)
+
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = Path(os.getenv("DATA_DIR", PROJECT_ROOT / "data"))
 DB_PATH  = DATA_DIR / "trends.duckdb"
 
-def _ensure_db():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    con = duckdb.connect(DB_PATH.as_posix())
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS searches(
-          week TEXT,
-          term TEXT,
-          rank INTEGER
-        )
-    """)
-    con.close()
-
 def _sniff(path: Path):
-    enc = 'utf-8'
-    try:
-        preview = path.read_text(encoding='utf-8', errors='strict').splitlines()
-    except UnicodeDecodeError:
-        enc = 'utf-16'
-        preview = path.read_text(encoding='utf-16', errors='strict').splitlines()
-
-    header_line_idx = None
-    header_line = ''
-    for i, line in enumerate(preview[:200]):
-        if 'Search Term' in line and 'Search Frequency Rank' in line:
-            header_line_idx = i
-            header_line = line
-            break
+    """(encoding, header_line_idx, delim) — dosyanın sadece başı okunur."""
+    enc, header_line_idx, delim = sniff_week_csv(path)
     if header_line_idx is None:
         raise RuntimeError(f"Header not found in {path.name}")
-
-    delim = '\t' if '\t' in header_line else ','
     return enc, header_line_idx, delim
 
-import duckdb, os
+# ---------------------------------------------------------------------
+# Bağlantı yönetimi
+#   Süreç başına tek, uzun ömürlü DuckDB bağlantısı; ayarlar (SET) bir kez
+#   yapılır, her get_conn() çağrısı bu bağlantıdan ucuz bir cursor döner.
+#   - get_conn(): DATA_DIR/trends.duckdb — users / subscribers / payments.
+#     Aynı dosya bir süreçte hem read-only hem read-write açılamaz (DuckDB);
+#     bu yüzden read-write açılır, read_only parametresi uyumluluk için kalır.
+#   - dataset_conn(): yayındaki trend veri seti sürümü, salt-okunur
+#     (aşağıda "Veri seti sürümleri").
+#   - Yazmalar writer() üzerinden tek kilitle sıralanır.
+#   - Dosya değiştirilirse (os.replace -> yeni inode) açık cursor kalmadığında
+#     bağlantı kapatılıp yeniden açılır: DuckDB aynı yol için, eski instance'a
+#     bağlı tek bir bağlantı bile yaşıyorsa eski instance'ı döndürür.
+#   - fork sonrası (pid değişti) üst sürecin bağlantısı kullanılmaz.
+# ---------------------------------------------------------------------
+# RLock: GC, lock tutulurken aynı thread'de sızmış bir _Cursor'ı
+# finalize ederse (__del__ -> release) kendi kendini kilitlemesin
+_CONN_LOCK = threading.RLock()
+_WRITE_LOCK = threading.RLock()
+_shared = None   # _SharedConn (users DB)
+_dataset = None  # _SharedConn (yayındaki veri seti, salt-okunur)
+
+
+def _data_dir() -> str:
+    return os.environ.get("DATA_DIR", "/app/storage")
+
+
+def _file_id(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_dev, st.st_ino
+    except FileNotFoundError:
+        return None
+
+
+def duckdb_threads() -> int:
+    """DuckDB thread sayısı (DUCKDB_THREADS, varsayılan 2)."""
+    try:
+        return max(1, int(os.environ.get("DUCKDB_THREADS", "2")))
+    except ValueError:
+        return 2
+
+
+def _configure(con, tmp_path: str):
+    """Instance geneli ayarlar (cursor'lar devralır)."""
+    # temp klasörü garantiye al
+    os.makedirs(tmp_path, exist_ok=True)
+    con.execute(f"SET temp_directory='{tmp_path}';")
+    con.execute("SET max_temp_directory_size='10GB';")
+    con.execute("SET memory_limit='2GB';")
+    # DUCKDB_THREADS: sorgu + toplu yükleme (çok dosyalı read_csv) paralelliği
+    con.execute(f"SET threads={duckdb_threads()};")
+    con.execute("SET preserve_insertion_order=false;")
+    # Parquet deposu: dosya footer'ları her sorguda yeniden okunmasın
+    con.execute("SET parquet_metadata_cache=true;")
+
+
+class _SharedConn:
+    def __init__(self, db_path: str, tmp_path: str, read_only: bool = False, version=None):
+        self.path = db_path
+        self.db_dir = os.path.dirname(db_path)
+        self.version = version
+        self.pid = os.getpid()
+        self.con = duckdb.connect(db_path, read_only=read_only)
+        self.file_id = _file_id(db_path)
+        self.active = 0       # açık cursor sayısı
+        self.retired = False  # yerine yenisi açıldı; son cursor kapanınca kapatılır
+        _configure(self.con, tmp_path)
+
+    def release(self):
+        with _CONN_LOCK:
+            self.active -= 1
+            if self.retired and self.active == 0:
+                self.con.close()
+
+
+class _Cursor:
+    """Paylaşılan bağlantının cursor'ı; close() ile (ya da GC'de) iade edilir."""
+
+    def __init__(self, shared: _SharedConn):
+        self._shared = shared
+        self._cur = None
+        self.db_dir = shared.db_dir
+        self.version = shared.version  # dataset_conn(): yayınlanmış sürüm adı
+        self._cur = shared.con.cursor()
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def close(self):
+        if self._cur is not None:
+            self._cur.close()
+            self._cur = None
+            self._shared.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+def _checkout(shared: _SharedConn) -> _Cursor:
+    # çağıran active'i _CONN_LOCK altında artırmış olmalı
+    try:
+        return _Cursor(shared)
+    except Exception:
+        shared.release()
+        raise
+
 
 def get_conn(read_only=False):
     """
-    DuckDB bağlantısı (disk tabanlı mod)
+    DuckDB cursor'ı (disk tabanlı mod, süreç başına tek bağlantı)
     - Bellek limiti: 2 GB
     - Disk (temp) limiti: 10 GB
     - Render diski /app/storage altında çalışır
+    Kullanımdan sonra close() çağrılmalı; yazmalar için writer() kullanın.
+    Trend verisi (weeks / terms / ranks ...) için dataset_conn().
     """
-    data_dir = os.environ.get("DATA_DIR", "/app/storage")
+    global _shared
+    data_dir = _data_dir()
     db_path = os.path.join(data_dir, "trends.duckdb")
-    tmp_path = os.path.join(data_dir, "tmp")
 
-    # temp klasörü garantiye al
-    os.makedirs(tmp_path, exist_ok=True)
+    with _CONN_LOCK:
+        cur = _shared
+        if cur is not None and cur.pid != os.getpid():
+            cur = None  # fork: üst sürecin bağlantısına dokunma
+        elif cur is not None and cur.path != db_path:
+            _retire(cur)
+            cur = None
+        elif cur is not None and cur.active == 0 and _file_id(db_path) != cur.file_id:
+            # dosya değişmiş: eski instance tamamen kapanmalı ki yenisi açılsın
+            cur.con.close()
+            cur = None
+        if cur is None:
+            cur = _shared = _SharedConn(db_path, os.path.join(data_dir, "tmp"))
+        cur.active += 1
+    return _checkout(cur)
 
-    # bağlantı
-    con = duckdb.connect(db_path, read_only=read_only)
 
-    # sistem ayarları
-    con.execute(f"SET temp_directory='{tmp_path}';")
-    con.execute("SET max_temp_directory_size='10GB';")
-    con.execute("SET memory_limit='2GB';")
-    con.execute("SET threads=2;")
-    con.execute("SET preserve_insertion_order=false;")
+def _retire(shared: _SharedConn):
+    shared.retired = True
+    if shared.active == 0:
+        shared.con.close()
+
+
+@contextmanager
+def writer():
+    """Tüm yazmalar bu tek yazıcıdan geçer (süreç içi kilit + cursor)."""
+    with _WRITE_LOCK:
+        con = get_conn(read_only=False)
+        try:
+            yield con
+        finally:
+            con.close()
 
-    return con
 
 def ensure_subscribers_table():
     """
     Email subscribe için tablo (DuckDB içinde).
     """
-    con = get_conn(read_only=False)
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS subscribers (
-            email TEXT PRIMARY KEY,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    with writer() as con:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS subscribers (
+                email TEXT PRIMARY KEY,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+
+
+# ---------------------------------------------------------------------
+# Veri seti sürümleri (blue/green)
+#   DATA_DIR/datasets/<ver>/trends.duckdb   weeks / terms / ranks / streak / token
+#   DATA_DIR/datasets/<ver>/parquet/        (TREND_STORE=parquet ise) haftalık dosyalar
+#   DATA_DIR/datasets/CURRENT               yayındaki sürümün adı
+# Yeniden yükleme (init_full / append_week) canlı dosyaya dokunmaz: yeni bir
+# sürüm yazılır, doğrulanır ve CURRENT os.replace ile atomik olarak ona
+# çevrilir. Okuyucular bir sonraki dataset_conn() çağrısında yeni sürüme
+# geçer; o ana kadar eskisini okumaya devam eder, hiç beklemez.
+# Eski sürümler DATASET_KEEP adedi kalacak şekilde silinir (açık dosyalar
+# Linux'ta silindikten sonra da okunabilir; Parquet için bir-iki sürüm pay).
+# Sürüm üretimi süreç içinde kilit, süreçler arasında flock ile tek seferde bir.
+# ---------------------------------------------------------------------
+DATASET_KEEP = 2  # CURRENT dışında saklanan eski sürüm sayısı
+
+_BUILD_LOCK = threading.RLock()
+_build_lock_file = None
+_build_depth = 0
+_current_cache = (None, None)  # (CURRENT dosyasının stat anahtarı, sürüm)
+
+
+def _datasets_dir() -> Path:
+    return Path(_data_dir()) / "datasets"
+
+
+def _dataset_path(version: str) -> Path:
+    return _datasets_dir() / version / "trends.duckdb"
+
+
+def current_version():
+    """Yayındaki veri seti sürümü (CURRENT) ya da None. stat değişmedikçe dosya okunmaz."""
+    global _current_cache
+    path = _datasets_dir() / "CURRENT"
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (str(path), st.st_ino, st.st_mtime_ns, st.st_size)
+    if _current_cache[0] != key:
+        _current_cache = (key, path.read_text(encoding="utf-8").strip() or None)
+    return _current_cache[1]
+
+
+def dataset_conn():
+    """
+    Yayındaki veri setine salt-okunur cursor (süreç başına tek bağlantı).
+    CURRENT değiştiyse yeni sürüm açılır; eski bağlantı üzerindeki son
+    cursor kapanınca kapatılır. Kullanımdan sonra close() çağrılmalı.
+    """
+    global _dataset
+    version = current_version()
+    if version is None:
+        ensure_trend_schema()
+        version = current_version()
+    db_path = str(_dataset_path(version))
+
+    with _CONN_LOCK:
+        cur = _dataset
+        if cur is not None and cur.pid != os.getpid():
+            cur = None  # fork: üst sürecin bağlantısına dokunma
+        elif cur is not None and cur.path != db_path:
+            _retire(cur)
+            cur = None
+        if cur is None:
+            tmp_path = os.path.join(_data_dir(), "tmp", f"dataset-{os.getpid()}")
+            cur = _dataset = _SharedConn(db_path, tmp_path, read_only=True, version=version)
+        cur.active += 1
+    return _checkout(cur)
+
+
+@contextmanager
+def _build_lock():
+    """Sürüm üretimi: süreç içinde RLock, süreçler arasında datasets/.lock üzerinde flock."""
+    global _build_lock_file, _build_depth
+    import fcntl
+
+    with _BUILD_LOCK:
+        if _build_depth == 0:
+            _datasets_dir().mkdir(parents=True, exist_ok=True)
+            _build_lock_file = open(_datasets_dir() / ".lock", "w")
+            fcntl.flock(_build_lock_file, fcntl.LOCK_EX)
+        _build_depth += 1
+        try:
+            yield
+        finally:
+            _build_depth -= 1
+            if _build_depth == 0:
+                _build_lock_file.close()  # flock dosya kapanınca bırakılır
+                _build_lock_file = None
+
+
+def _link_or_copy(src, dst):
+    # Parquet dosyaları yazıldıktan sonra değişmez (yeni dosya + os.replace): hard link yeter
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+@contextmanager
+def build_dataset(base: bool = False, progress=None):
+    """
+    Yeni veri seti sürümüne yazan DuckDB bağlantısı verir (with bloğu).
+    Blok hatasız biterse sürüm doğrulanır, CURRENT ona çevrilir ve eski
+    sürümler temizlenir; hata olursa yarım sürüm silinir, yayındaki değişmez.
+      base=True: yayındaki sürümün kopyası üzerinde çalışılır (hafta ekleme)
+      progress(**alanlar): kilit bekleme / kopyalama / doğrulama / yayın aşamaları
+    """
+    progress = progress or _no_progress
+    progress(phase="waiting for build lock")
+    with _build_lock():
+        current = current_version()
+        now = time.time()
+        version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{int(now * 1000) % 1000:03d}-{os.urandom(2).hex()}"
+        vdir = _datasets_dir() / version
+        vdir.mkdir(parents=True)
+        try:
+            if base and current:
+                progress(phase="copy current dataset")
+                src = _datasets_dir() / current
+                shutil.copy2(src / "trends.duckdb", vdir / "trends.duckdb")
+                if (src / "parquet").is_dir():
+                    shutil.copytree(src / "parquet", vdir / "parquet", copy_function=_link_or_copy)
+            con = duckdb.connect(str(vdir / "trends.duckdb"))
+            try:
+                _configure(con, str(vdir / "tmp"))
+                if _parquet_ranks(con):
+                    _create_ranks_view(con)  # kopyadaki view eski sürümün dosyalarına bakıyor
+                yield con
+                progress(phase="validate", current_file=None)
+                _validate_dataset(con, _published_weeks() if current else 0)
+                con.execute("CHECKPOINT")
+            finally:
+                con.close()
+            shutil.rmtree(vdir / "tmp", ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(vdir, ignore_errors=True)
+            raise
+        progress(phase="publish")
+        _publish(version)
+        print(f"✅ dataset {version} published")
+        gc_datasets()
+
+
+def _published_weeks() -> int:
+    con = dataset_conn()
+    try:
+        return con.execute("SELECT COUNT(*) FROM weeks").fetchone()[0]
+    finally:
+        con.close()
+
+
+def _validate_dataset(con, published_weeks: int = 0):
+    """Yayından önce tutarlılık kontrolü; sorun varsa RuntimeError (sürüm yayınlanmaz)."""
+    n, lo, hi = con.execute("SELECT COUNT(*), MIN(week_id), MAX(week_id) FROM weeks").fetchone()
+    if published_weeks and not n:
+        raise RuntimeError(f"dataset validation failed: empty dataset would replace {published_weeks} weeks")
+    if n and (lo != 1 or hi != n):
+        raise RuntimeError(f"dataset validation failed: week ids {lo}..{hi} for {n} weeks")
+    dup = con.execute("SELECT COUNT(*) - COUNT(DISTINCT term_id) FROM terms").fetchone()[0]
+    if dup:
+        raise RuntimeError(f"dataset validation failed: {dup} duplicate term ids")
+    if not n:
+        return
+    empty = con.execute("""
+        SELECT w.label FROM weeks w
+        WHERE NOT EXISTS (SELECT 1 FROM ranks r WHERE r.week_id = w.week_id)
+        LIMIT 1
+    """).fetchone()
+    if empty:
+        raise RuntimeError(f"dataset validation failed: no rows for {empty[0]}")
+    if not con.execute("SELECT COUNT(*) FROM term_streaks WHERE week_id = ?", [n]).fetchone()[0]:
+        raise RuntimeError("dataset validation failed: streak index missing last week")
+    # API sorguları bu sürümde çalışıyor mu
+    fetch_weeks(con)
+    fetch_uptrends(con, max(1, n - 1), n, "", "", 1_500_000, 1, 0)
+    fetch_uptrends(con, max(1, n - 1), n, "", "", 1_500_000, 1, 0, strict=True)
+
+
+def _publish(version: str):
+    path = _datasets_dir() / "CURRENT"
+    tmp = path.with_name(f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def gc_datasets(keep: int = DATASET_KEEP):
+    """CURRENT ve en yeni `keep` eski sürüm dışındaki sürüm klasörlerini siler."""
+    with _build_lock():
+        current = current_version()
+        versions = sorted(
+            (p for p in _datasets_dir().iterdir() if p.is_dir() and p.name != current),
+            key=lambda p: p.name, reverse=True,
         )
-    """)
-    con.close()
+        for p in versions[keep:]:
+            shutil.rmtree(p, ignore_errors=True)
+            print(f"🗑️ dataset {p.name} removed")
+
 
+_LEGACY_TREND_TABLES = ("searches", "weeks", "terms", "ranks", "term_streaks", "term_tokens")
 
 
+def ensure_trend_schema():
+    """
+    Uygulama açılışında: yayında bir veri seti sürümü olsun.
+    - CURRENT yoksa ana DB'deki (eski düzen) trend tabloları yeni bir sürüme
+      taşınır ve ana DB'den silinir; hiç veri yoksa boş bir sürüm yayınlanır.
+    - Yayındaki sürüm diğer depo ile yazılmışsa (TREND_STORE değişti) ya da
+      şemada eksik varsa kopyası üzerinde tamamlanıp yeniden yayınlanır.
+    """
+    with _build_lock():
+        if current_version() is None:
+            _publish_legacy_dataset()
+            return
+        con = dataset_conn()
+        kind = _table_type(con, "ranks")
+        has_tables = _table_type(con, "ingest_manifest") is not None
+        meta_ok = all(_meta_get(con, k) == str(v) for k, v in _SCHEMA_VERSIONS.items())
+        con.close()
+        if kind != ("VIEW" if store_mode() == "parquet" else "BASE TABLE") or not has_tables or not meta_ok:
+            with build_dataset(base=True) as con:
+                create_trend_schema(con)
 
 
+def _publish_legacy_dataset():
+    # ana DB'deki tablolar Parquet ile dışarı alınır: aynı dosyayı ikinci bir
+    # instance'tan açmak (ATTACH) yerine
+    export = _datasets_dir() / f".import-{os.getpid()}"
+    shutil.rmtree(export, ignore_errors=True)
+    export.mkdir(parents=True)
+    try:
+        tables = []
+        with writer() as main:
+            for name in _LEGACY_TREND_TABLES:
+                kind = _table_type(main, name)
+                if kind is None or (name == "searches" and kind == "VIEW"):
+                    continue
+                main.execute(f"COPY (SELECT * FROM {name}) TO {_sql_str(export / (name + '.parquet'))} (FORMAT PARQUET)")
+                tables.append(name)
+        if tables:
+            print(f"↻ moving trend tables to a dataset version: {', '.join(tables)}")
+        with build_dataset() as con:
+            for name in tables:
+                con.execute(f"CREATE TABLE {name} AS SELECT * FROM read_parquet({_sql_str(export / (name + '.parquet'))})")
+            create_trend_schema(con)
+        if tables:
+            with writer() as main:
+                _drop_trend_tables(main)
+    finally:
+        shutil.rmtree(export, ignore_errors=True)
 
 
-def init_full(project_root: Path):
-    """data/raw altındaki TÜM CSV'leri baştan yükler."""
-    raw = Path(project_root) / "data" / "raw"
-    _ensure_db()
-    con = get_conn(read_only=False)
-    con.execute("DROP TABLE IF EXISTS searches")
-    con.execute("CREATE TABLE searches(week TEXT, term TEXT, rank INTEGER)")
-    for p in sorted(raw.glob("*.csv")):
-        enc, skip, delim = _sniff(p)
-        con.execute(f"""
-            INSERT INTO searches
-            SELECT
-              '{p.stem}'::TEXT AS week,
-              "Search Term"::TEXT AS term,
-              TRY_CAST("Search Frequency Rank" AS INT) AS rank
-            FROM read_csv(
-              '{p.as_posix()}',
-              AUTO_DETECT=TRUE,
-              HEADER=TRUE,
-              SKIP={skip},
-              DELIM='{delim}',
-              ENCODING='{enc}',
-              QUOTE='"',
-              ESCAPE='"',
-              NULLSTR='',
-              IGNORE_ERRORS=TRUE
-            )
-            WHERE "Search Term" IS NOT NULL AND TRIM("Search Term") <> '';
-        """)
-    con.close()
+# ---------------------------------------------------------------------
+# Star şema
+#   weeks(week_id, label, week_date)         hafta boyutu; week_id = label sırası (1..N)
+#   terms(term_id, term, term_norm, flags)   term sözlüğü; term_norm = LOWER(TRIM(term))
+#   ranks(term_id, week_id, rank)            fact tablosu; (term, week) başına tek satır, term_id sıralı
+#   searches                                 eski (week, term, rank) görünümü (VIEW)
+# Sorgular ranks üzerinde integer filtre/join yapar, term metnine yalnızca
+# filtre ve sonuç satırları için gider.
+# ---------------------------------------------------------------------
+# terms.flags bitleri trend_core.TERM_* ile ortak (term_flags ile aynı kurallar);
+# /uptrends ve /series CLEAN_MASK, /diag JUNK_MASK ile filtreler.
+CLEAN_MASK = TERM_SHORT | TERM_UNCASED
 
-def append_week(week_csv_path: str, week_label: str):
-    """Tek haftayı (CSV) ekler."""
-    _ensure_db()
-    p = Path(week_csv_path)
-    enc, skip, delim = _sniff(p)
-    con = get_conn(read_only=False)
-    con.execute("CREATE TABLE IF NOT EXISTS searches(week TEXT, term TEXT, rank INTEGER)")
-    con.execute(f"""
-        INSERT INTO searches
-        SELECT
-          '{week_label}'::TEXT,
-          "Search Term"::TEXT,
-          TRY_CAST("Search Frequency Rank" AS INT)
-        FROM read_csv(
-          '{p.as_posix()}',
+_TERM_FLAGS_SQL = f"""(
+    CASE WHEN LENGTH(TRIM(term)) < 2 THEN {TERM_SHORT} ELSE 0 END
+  | CASE WHEN LOWER(TRIM(term)) = UPPER(TRIM(term)) THEN {TERM_UNCASED} ELSE 0 END
+  | CASE WHEN starts_with(TRIM(term), '#') THEN {TERM_FORMULA} ELSE 0 END
+  | CASE WHEN regexp_full_match(TRIM(term), '[0-9.eE+\\-]+') THEN {TERM_NUMERIC} ELSE 0 END
+  | CASE WHEN NOT regexp_matches(TRIM(term), '[A-Za-z]') THEN {TERM_NO_LETTERS} ELSE 0 END
+)"""
+# _TERM_FLAGS_SQL değişince artırılır: mevcut sürümlerde terms.flags yeniden hesaplanır
+TERM_FLAGS_VERSION = 2
+# ranks düzeni: 2 = (term, week) başına tek satır, term_id, week_id sıralı
+RANKS_LAYOUT_VERSION = 2
+# uptrend_mat sıralaması: 2 = eşitlikte term metni (keyset sayfalama ile aynı sıra)
+UPTREND_MAT_VERSION = 2
+
+# trend_meta'daki şema sürümleri; biri eskiyse sürüm kopyalanıp tamamlanır
+_SCHEMA_VERSIONS = {
+    "term_flags": TERM_FLAGS_VERSION,
+    "ranks_layout": RANKS_LAYOUT_VERSION,
+    "uptrend_mat": UPTREND_MAT_VERSION,
+}
+
+# label: US_Top_Search_Terms_Simple_Week_YYYY_MM_DD (dosya adı kökü)
+_WEEK_DATE_SQL = r"TRY_STRPTIME(regexp_extract(label, '(\d{4}_\d{2}_\d{2})$', 1), '%Y_%m_%d')::DATE"
+
+STAGE_TABLE = "searches_stage"
+
+
+def _table_type(con, name: str):
+    """'BASE TABLE' / 'VIEW' ya da yoksa None."""
+    row = con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = ?", [name]
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _meta_get(con, key: str):
+    if _table_type(con, "trend_meta") is None:
+        return None
+    row = con.execute("SELECT value FROM trend_meta WHERE key = ?", [key]).fetchone()
+    return row[0] if row else None
+
+
+def _meta_set(con, key: str, value):
+    con.execute("INSERT OR REPLACE INTO trend_meta VALUES (?, ?)", [key, str(value)])
+
+
+def create_trend_schema(con):
+    """
+    Tabloları ve searches view'ını oluşturur. Eski şemadaki searches TABLOSU
+    varsa satırları star şemaya taşınır ve tablo view ile değiştirilir.
+    """
+    legacy = _table_type(con, "searches") == "BASE TABLE"
+    if legacy:
+        print("↻ migrating legacy searches table to weeks/terms/ranks")
+        con.execute("DROP TABLE IF EXISTS searches_legacy")
+        con.execute("ALTER TABLE searches RENAME TO searches_legacy")
+        # eski streak/token tabloları term metniyle anahtarlıydı
+        con.execute("DROP TABLE IF EXISTS term_streaks")
+        con.execute("DROP TABLE IF EXISTS term_tokens")
+
+    con.execute("CREATE TABLE IF NOT EXISTS weeks(week_id INTEGER, label TEXT, week_date DATE)")
+    con.execute("CREATE TABLE IF NOT EXISTS terms(term_id INTEGER, term TEXT, term_norm TEXT, flags INTEGER)")
+    con.execute("CREATE TABLE IF NOT EXISTS trend_meta(key TEXT PRIMARY KEY, value TEXT)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest(
+          file_name TEXT PRIMARY KEY, content_hash TEXT, row_count BIGINT,
+          week_label TEXT, loaded_at TIMESTAMP
+        )
+    """)
+    _ensure_ranks(con)
+    if _meta_get(con, "term_flags") != str(TERM_FLAGS_VERSION):
+        con.execute(f"UPDATE terms SET flags = {_TERM_FLAGS_SQL}")
+        _meta_set(con, "term_flags", TERM_FLAGS_VERSION)
+
+    if legacy:
+        ingest_stage(con, "searches_legacy")
+        con.execute("DROP TABLE searches_legacy")
+    if _meta_get(con, "ranks_layout") != str(RANKS_LAYOUT_VERSION):
+        if _parquet_ranks(con):
+            for (label,) in con.execute("SELECT label FROM weeks ORDER BY week_id").fetchall():
+                if _week_file(con, label).exists():
+                    _write_week_parquet(con, label)
+        else:
+            _rewrite_ranks(con)
+        _meta_set(con, "ranks_layout", RANKS_LAYOUT_VERSION)
+    if _meta_get(con, "uptrend_mat") != str(UPTREND_MAT_VERSION):
+        con.execute("DROP TABLE IF EXISTS uptrend_mat")
+        con.execute("DROP TABLE IF EXISTS uptrend_mat_windows")
+        _update_uptrend_mat(con, None)
+        _meta_set(con, "uptrend_mat", UPTREND_MAT_VERSION)
+
+    con.execute("""
+        CREATE OR REPLACE VIEW searches AS
+        SELECT w.label AS week, t.term, r.rank
+        FROM ranks r
+        JOIN weeks w USING(week_id)
+        JOIN terms t USING(term_id)
+    """)
+
+
+def _read_csv_sql(files: str, enc: str, skip: int, delim: str, extra: str = "") -> str:
+    return f"""read_csv(
+          {files},
           AUTO_DETECT=TRUE,
           HEADER=TRUE,
           SKIP={skip},
@@ -141,8 +579,1002 @@ def append_week(week_csv_path: str, week_label: str):
           QUOTE='"',
           ESCAPE='"',
           NULLSTR='',
-          IGNORE_ERRORS=TRUE
-        )
+          IGNORE_ERRORS=TRUE{extra}
+        )"""
+
+
+def insert_week_csv(con, table: str, path: Path, week_label: str):
+    """Tek haftalık CSV'yi (week, term, rank) staging tablosuna ekler."""
+    enc, skip, delim = _sniff(path)
+    con.execute(f"""
+        INSERT INTO {table}
+        SELECT
+          ?::TEXT AS week,
+          "Search Term"::TEXT AS term,
+          TRY_CAST("Search Frequency Rank" AS INT) AS rank
+        FROM {_read_csv_sql(_sql_str(path.as_posix()), enc, skip, delim)}
         WHERE "Search Term" IS NOT NULL AND TRIM("Search Term") <> '';
+    """, [week_label])
+
+
+def load_week_csvs(con, table: str, paths, progress=None) -> int:
+    """
+    Haftalık CSV'lerin hepsini tek CREATE TABLE AS ile (week, term, rank)
+    staging tablosuna yükler; week = dosya adı (uzantısız), dosya başına
+    INSERT yerine.
+    Dosyalar lehçeye (encoding, skip, delim) göre gruplanır; her grup tek bir
+    çok dosyalı read_csv olur, DuckDB dosyaları kendi thread'lerine dağıtır.
+    union_by_name: export'lar arasında ek kolonlar değişse de
+    "Search Term" / "Search Frequency Rank" adla eşlenir.
+    progress(**alanlar): dosya dosya sniff, yüklemeden sonra dosya başına satır
+    Dönen: yüklenen satır sayısı
+    """
+    progress = progress or _no_progress
+    paths = [Path(p) for p in paths]
+    groups = {}
+    for i, p in enumerate(paths, 1):
+        progress(phase="sniff", files_total=len(paths), files_done=i - 1, current_file=p.name)
+        groups.setdefault(_sniff(p), []).append(p.as_posix())
+    progress(phase="load", files_done=0, current_file=None)
+
+    parts = []
+    for (enc, skip, delim), files in sorted(groups.items()):
+        file_list = "[" + ", ".join(_sql_str(f) for f in files) + "]"
+        parts.append(f"""
+        SELECT
+          parse_filename(filename, true)::TEXT AS week,
+          "Search Term"::TEXT AS term,
+          TRY_CAST("Search Frequency Rank" AS INT) AS rank
+        FROM {_read_csv_sql(file_list, enc, skip, delim, ", FILENAME=TRUE, UNION_BY_NAME=TRUE")}
+        WHERE "Search Term" IS NOT NULL AND TRIM("Search Term") <> ''""")
+    if not parts:
+        parts = ["SELECT NULL::TEXT AS week, NULL::TEXT AS term, NULL::INTEGER AS rank WHERE false"]
+
+    con.execute(f"CREATE OR REPLACE TABLE {table} AS " + "\n        UNION ALL".join(parts))
+    file_rows = dict(con.execute(f"SELECT week, COUNT(*) FROM {table} GROUP BY week").fetchall())
+    rows = sum(file_rows.values())
+    progress(files_done=len(paths), rows=rows, file_rows=file_rows)
+    return rows
+
+
+def _no_progress(**fields):
+    pass
+
+
+def _load_stage(con, stage: str):
+    """
+    stage(week, term, rank) satırlarını weeks / terms / ranks'e ekler.
+    Yeni hafta araya giriyorsa week_id'ler label sırasına göre yeniden atanır.
+    Dönen: (ilk yeni week_id ya da None, ilk yeni term_id)
+    """
+    first_week = None
+    new_labels = f"SELECT DISTINCT week FROM {stage} WHERE week NOT IN (SELECT label FROM weeks)"
+    if con.execute(f"SELECT COUNT(*) FROM ({new_labels})").fetchone()[0]:
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE week_map AS
+            SELECT old_id, label, ROW_NUMBER() OVER (ORDER BY label)::INTEGER AS new_id
+            FROM (
+              SELECT week_id AS old_id, label FROM weeks
+              UNION ALL
+              SELECT NULL, week FROM ({new_labels})
+            )
+        """)
+        if not _parquet_ranks(con):
+            # parquet'te week_id dosyada değil, label'dan türetilir
+            con.execute("""
+                UPDATE ranks SET week_id = m.new_id
+                FROM week_map m
+                WHERE ranks.week_id = m.old_id AND m.old_id <> m.new_id
+            """)
+        con.execute("DELETE FROM weeks")
+        con.execute(f"INSERT INTO weeks SELECT new_id, label, {_WEEK_DATE_SQL} FROM week_map ORDER BY new_id")
+        first_week = con.execute("SELECT MIN(new_id) FROM week_map WHERE old_id IS NULL").fetchone()[0]
+        con.execute("DROP TABLE week_map")
+
+    first_term = con.execute("SELECT COALESCE(MAX(term_id), 0) + 1 FROM terms").fetchone()[0]
+    con.execute(f"""
+        INSERT INTO terms
+        SELECT (? + ROW_NUMBER() OVER (ORDER BY term) - 1)::INTEGER,
+               term, LOWER(TRIM(term)), {_TERM_FLAGS_SQL}
+        FROM (
+          SELECT DISTINCT term FROM {stage} WHERE term IS NOT NULL
+          EXCEPT
+          SELECT term FROM terms
+        )
+    """, [first_term])
+
+    if _parquet_ranks(con):
+        labels = [r[0] for r in con.execute(f"SELECT DISTINCT week FROM {stage} ORDER BY week").fetchall()]
+        for label in labels:
+            _write_week_parquet(con, label, f"""
+                SELECT t.term_id, s.rank
+                FROM {stage} s
+                JOIN terms t ON t.term = s.term
+                WHERE s.week = {_sql_str(label)}
+            """)
+        _create_ranks_view(con)
+    else:
+        _rewrite_ranks(con, f"""
+            SELECT t.term_id, w.week_id, s.rank
+            FROM {stage} s
+            JOIN terms t ON t.term = s.term
+            JOIN weeks w ON w.label = s.week
+        """)
+    return first_week, first_term
+
+
+def _rewrite_ranks(con, extra_sql: str = None):
+    """
+    ranks tablosunu (+ extra_sql satırlarını) (term, week) başına tek satır
+    (en iyi rank) olacak şekilde, term_id, week_id sırasıyla yeniden yazar:
+    /series ve term başına agregalar bitişik blokları okur.
+    """
+    union = f"UNION ALL {extra_sql}" if extra_sql else ""
+    con.execute(f"""
+        CREATE OR REPLACE TABLE ranks AS
+        SELECT term_id, week_id, MIN(rank) AS rank
+        FROM (SELECT term_id, week_id, rank FROM ranks {union})
+        GROUP BY term_id, week_id
+        ORDER BY term_id, week_id
+    """)
+
+
+def ingest_stage(con, stage: str):
+    """
+    Staging tablosunu star şemaya yükler; streak, token index'leri ve
+    materyalize uptrend pencerelerini günceller.
+    """
+    first_week, first_term = _load_stage(con, stage)
+    _update_streaks(con, first_week)
+    _update_term_tokens(con, first_term)
+    if first_week is None:
+        # yeni hafta yok, var olan haftalara satır eklendi
+        first_week = con.execute(f"""
+            SELECT MIN(w.week_id) FROM weeks w
+            WHERE w.label IN (SELECT DISTINCT week FROM {stage})
+        """).fetchone()[0]
+    _update_uptrend_mat(con, first_week)
+
+
+# ---------------------------------------------------------------------
+# Fact deposu: DuckDB tablosu (varsayılan) ya da haftalık Parquet (TREND_STORE=parquet)
+#   DATA_DIR/parquet/week=<label>/ranks.parquet   (term_id, rank), term_id sıralı
+#   DATA_DIR/parquet/manifest.json                 hafta başına dosya, satır ve rank aralığı
+# Parquet modunda ranks tüm dosyalar üzerinde bir VIEW'dır (streak / token
+# index'leri, searches view'ı, /diag); pencere sorguları ise ranks_window()
+# ile sadece [start, end] haftalarının dosyalarını okur. term_id sıralı
+# row group'ların min/max istatistikleri /series'teki term filtresini,
+# rank <= maxRank filtresi de (yoğun değilse) row group atlamayı sağlar.
+# Hafta eklemek = tek dosya yazmak; week_id dosyada tutulmaz, araya hafta
+# girdiğinde dosyalar yeniden yazılmaz.
+# ---------------------------------------------------------------------
+PARQUET_ROW_GROUP = 65_536
+PARQUET_MANIFEST_VERSION = 1
+
+
+def store_mode() -> str:
+    """TREND_STORE: 'duckdb' (varsayılan) ya da 'parquet'."""
+    mode = (os.environ.get("TREND_STORE") or "duckdb").strip().lower()
+    return "parquet" if mode == "parquet" else "duckdb"
+
+
+def _parquet_dir(con) -> Path:
+    """con'un DuckDB dosyasının yanındaki parquet/ klasörü (sürüm başına ayrı)."""
+    db_dir = getattr(con, "db_dir", None)
+    if db_dir is None:
+        path = con.execute(
+            "SELECT path FROM duckdb_databases() WHERE database_name = current_database()"
+        ).fetchone()[0]
+        db_dir = os.path.dirname(path) if path else _data_dir()
+    return Path(db_dir) / "parquet"
+
+
+def _week_file(con, label: str) -> Path:
+    return _parquet_dir(con) / f"week={label}" / "ranks.parquet"
+
+
+def _sql_str(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _parquet_ranks(con) -> bool:
+    return _table_type(con, "ranks") == "VIEW"
+
+
+def _load_parquet_manifest(con) -> dict:
+    try:
+        m = json.loads((_parquet_dir(con) / "manifest.json").read_text(encoding="utf-8"))
+    except Exception:
+        return {"version": PARQUET_MANIFEST_VERSION, "weeks": {}}
+    return m if m.get("version") == PARQUET_MANIFEST_VERSION else {"version": PARQUET_MANIFEST_VERSION, "weeks": {}}
+
+
+def _save_parquet_manifest(con, manifest: dict):
+    path = _parquet_dir(con) / "manifest.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _write_week_parquet(con, label: str, select_sql: str = None):
+    """
+    (term_id, rank) satırlarını haftanın Parquet dosyasına yazar; dosya varsa
+    (aynı haftaya tekrar ekleme) mevcut satırlarla birleştirilir. Term başına
+    tek satır (en iyi rank) kalır. select_sql None ise mevcut dosya yeniden yazılır.
+    """
+    path = _week_file(con, label)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    parts = [select_sql] if select_sql else []
+    if path.exists():
+        parts.insert(0, f"SELECT term_id, rank FROM read_parquet({_sql_str(path)})")
+    tmp = path.with_name(path.name + ".tmp")
+    con.execute(f"""
+        COPY (
+          SELECT term_id, MIN(rank) AS rank FROM ({" UNION ALL ".join(parts)})
+          GROUP BY term_id ORDER BY term_id
+        )
+        TO {_sql_str(tmp)} (FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE {PARQUET_ROW_GROUP})
+    """)
+    os.replace(tmp, path)
+
+    rows, min_rank, max_rank = con.execute(
+        f"SELECT COUNT(*), MIN(rank), MAX(rank) FROM read_parquet({_sql_str(path)})"
+    ).fetchone()
+    manifest = _load_parquet_manifest(con)
+    manifest["weeks"][label] = {
+        "file": path.relative_to(_parquet_dir(con)).as_posix(),
+        "rows": int(rows),
+        "min_rank": min_rank,
+        "max_rank": max_rank,
+        "bytes": path.stat().st_size,
+    }
+    _save_parquet_manifest(con, manifest)
+
+
+def _create_ranks_view(con):
+    pdir = _parquet_dir(con)
+    if any(pdir.glob("week=*/ranks.parquet")):
+        pattern = _sql_str((pdir / "week=*" / "ranks.parquet").as_posix())
+        con.execute(f"""
+            CREATE OR REPLACE VIEW ranks AS
+            SELECT p.term_id, w.week_id, p.rank
+            FROM read_parquet({pattern}, hive_partitioning = true, hive_types = {{'week': VARCHAR}}) p
+            JOIN weeks w ON w.label = p.week
+        """)
+    else:
+        con.execute("""
+            CREATE OR REPLACE VIEW ranks AS
+            SELECT NULL::INTEGER AS term_id, NULL::INTEGER AS week_id, NULL::INTEGER AS rank
+            WHERE false
+        """)
+
+
+def _ensure_ranks(con):
+    """
+    ranks'i seçili depoya göre hazırlar; depo değiştiyse veriyi taşır
+    (tablo -> haftalık Parquet dosyaları ya da tersi).
+    """
+    kind = _table_type(con, "ranks")
+    if store_mode() == "parquet":
+        if kind == "BASE TABLE":
+            print("↻ exporting ranks table to parquet store")
+            shutil.rmtree(_parquet_dir(con), ignore_errors=True)
+            for (label,) in con.execute("SELECT label FROM weeks ORDER BY week_id").fetchall():
+                _write_week_parquet(con, label, f"""
+                    SELECT r.term_id, r.rank FROM ranks r
+                    JOIN weeks w USING(week_id)
+                    WHERE w.label = {_sql_str(label)}
+                """)
+            con.execute("DROP VIEW IF EXISTS searches")
+            con.execute("DROP TABLE ranks")
+        _create_ranks_view(con)
+        return
+
+    if kind == "VIEW":
+        print("↻ importing parquet store into ranks table")
+        con.execute("""
+            CREATE OR REPLACE TABLE ranks_import AS
+            SELECT term_id, week_id, rank FROM ranks ORDER BY term_id, week_id
+        """)
+        con.execute("DROP VIEW IF EXISTS searches")
+        con.execute("DROP VIEW ranks")
+        con.execute("ALTER TABLE ranks_import RENAME TO ranks")
+        shutil.rmtree(_parquet_dir(con), ignore_errors=True)
+    con.execute("CREATE TABLE IF NOT EXISTS ranks(term_id INTEGER, week_id INTEGER, rank INTEGER)")
+
+
+def ranks_window(con, start_id: int, end_id: int) -> str:
+    """
+    [start_id, end_id] haftalarının (term_id, week_id, rank) satırları için
+    FROM'a konacak alt sorgu. Parquet'te sadece o haftaların dosyaları okunur.
+    """
+    start_id, end_id = int(start_id), int(end_id)
+    if store_mode() != "parquet":
+        return f"(SELECT term_id, week_id, rank FROM ranks WHERE week_id BETWEEN {start_id} AND {end_id})"
+    weeks = con.execute(
+        "SELECT week_id, label FROM weeks WHERE week_id BETWEEN ? AND ? ORDER BY week_id",
+        [start_id, end_id],
+    ).fetchall()
+    parts = [
+        f"SELECT term_id, {int(wid)}::INTEGER AS week_id, rank FROM read_parquet({_sql_str(_week_file(con, label))})"
+        for wid, label in weeks
+    ]
+    if not parts:
+        return "(SELECT NULL::INTEGER AS term_id, NULL::INTEGER AS week_id, NULL::INTEGER AS rank WHERE false)"
+    return "(" + " UNION ALL ".join(parts) + ")"
+
+
+# ---------------------------------------------------------------------
+# Uptrend streak index
+#   term_streaks(week_id, term_id, rank, present_run, up_run)
+#   up_run      = o haftada biten STRICT iyileşme serisinin hafta sayısı
+#   present_run = o haftada biten kesintisiz mevcudiyet serisi
+#   [s..e] strict uptrend  <=>  e haftasında up_run >= e - s + 1
+# ---------------------------------------------------------------------
+def _rebuild_streaks(con):
+    """term_streaks tablosunu ranks'ten baştan üretir."""
+    con.execute("DROP TABLE IF EXISTS term_streaks")
+    con.execute("""
+        CREATE TABLE term_streaks AS
+        WITH best AS (
+          SELECT week_id, term_id, MIN(rank) AS rank
+          FROM ranks
+          WHERE rank IS NOT NULL
+          GROUP BY week_id, term_id
+        ),
+        lagged AS (
+          SELECT *,
+                 LAG(week_id) OVER (PARTITION BY term_id ORDER BY week_id) AS prev_week_id,
+                 LAG(rank)    OVER (PARTITION BY term_id ORDER BY week_id) AS prev_rank
+          FROM best
+        ),
+        runs AS (
+          SELECT *,
+                 SUM(CASE WHEN prev_week_id = week_id - 1 THEN 0 ELSE 1 END)
+                   OVER (PARTITION BY term_id ORDER BY week_id) AS present_grp,
+                 SUM(CASE WHEN prev_week_id = week_id - 1 AND prev_rank > rank THEN 0 ELSE 1 END)
+                   OVER (PARTITION BY term_id ORDER BY week_id) AS up_grp
+          FROM lagged
+        )
+        SELECT week_id,
+               term_id,
+               rank,
+               ROW_NUMBER() OVER (PARTITION BY term_id, present_grp ORDER BY week_id)::INTEGER AS present_run,
+               ROW_NUMBER() OVER (PARTITION BY term_id, up_grp ORDER BY week_id)::INTEGER AS up_run
+        FROM runs
+        ORDER BY week_id, term_id
     """)
+
+
+def _update_streaks(con, first_week):
+    """
+    Tek yeni hafta en güncel haftaysa streak satırlarını bir önceki haftadan
+    artımlı ekler; araya giren / birden çok hafta ya da var olan haftaya
+    ekleme durumunda tüm index yeniden kurulur.
+    """
+    last = con.execute("SELECT MAX(week_id) FROM weeks").fetchone()[0]
+    indexed = None
+    if _table_type(con, "term_streaks"):
+        indexed = con.execute("SELECT MAX(week_id) FROM term_streaks").fetchone()[0]
+    if first_week is None or first_week != last or indexed is None or indexed != last - 1:
+        _rebuild_streaks(con)
+        return
+
+    con.execute(f"""
+        INSERT INTO term_streaks
+        SELECT ?, n.term_id, n.rank,
+               CASE WHEN p.term_id IS NULL THEN 1 ELSE p.present_run + 1 END,
+               CASE WHEN p.rank > n.rank THEN p.up_run + 1 ELSE 1 END
+        FROM (
+          SELECT term_id, MIN(rank) AS rank
+          FROM {ranks_window(con, last, last)}
+          WHERE week_id = ? AND rank IS NOT NULL
+          GROUP BY term_id
+        ) n
+        LEFT JOIN term_streaks p ON p.term_id = n.term_id AND p.week_id = ?
+    """, [last, last, last - 1])
+
+
+# ---------------------------------------------------------------------
+# Include/exclude token index
+#   term_tokens(token, term_id): LOWER(term)'in [a-z]+ koşuları, token'a göre sıralı.
+#   /uptrends'teki (^|[^a-z])kelime([^a-z]|$) regex'i, harflerden oluşan
+#   kelime için "token = kelime" ile birebir aynıdır.
+# ---------------------------------------------------------------------
+_TOKENS_SQL = """
+    SELECT DISTINCT token, term_id
+    FROM (
+      SELECT UNNEST(regexp_split_to_array(LOWER(term), '[^a-z]+')) AS token, term_id
+      FROM terms
+      WHERE term_id >= ?
+    )
+    WHERE token <> ''
+"""
+
+
+def _rebuild_term_tokens(con):
+    con.execute("DROP TABLE IF EXISTS term_tokens")
+    con.execute(f"CREATE TABLE term_tokens AS {_TOKENS_SQL} ORDER BY token, term_id", [1])
+
+
+def _update_term_tokens(con, first_term: int):
+    """Sadece yeni eklenen term'lerin (term_id >= first_term) token'larını ekler."""
+    if not _table_type(con, "term_tokens"):
+        _rebuild_term_tokens(con)
+        return
+    con.execute(f"INSERT INTO term_tokens {_TOKENS_SQL}", [first_term])
+
+
+# ---------------------------------------------------------------------
+# Materyalize uptrend pencereleri
+#   uptrend_mat_windows(start_id, end_id, max_rank, rank_ceiling)
+#   uptrend_mat(start_id, end_id, max_rank, pos, term_id, term,
+#               start_rank, end_rank, total_improvement, weeks)
+# Trafiğin çoğu aynı pencereleri sorar: en yeni haftada biten 3/4/6/8/12
+# hafta ve demo'nun 6 haftalık pencereleri. Bunların filtresiz, tam ve
+# sıralı (pos) uptrend listesi ingest sırasında hesaplanır; /uptrends
+# (strict olmayan) bu pencerelerde listeyi okuyup include/exclude'u ve
+# sayfalamayı üstüne uygular. Term'in satırları yalnızca kendisine bağlı
+# olduğundan filtreyi önce ya da sonra uygulamak aynı sonucu verir.
+# term metni de satırda tutulur: sayfa için terms'e join gerekmez.
+# max_rank sonucu etkiler: UPTREND_MAT_MAX_RANKS (virgüllü, varsayılan
+# 1500000) değerleri için hesaplanır; pencerenin en büyük rank'ı
+# (rank_ceiling) iki değeri de aşmıyorsa sonuç aynıdır.
+# ---------------------------------------------------------------------
+UPTREND_MAT_WINDOWS = (3, 4, 6, 8, 12)
+DEMO_WEEKS = 6
+
+
+def uptrend_mat_max_ranks():
+    raw = os.environ.get("UPTREND_MAT_MAX_RANKS") or "1500000"
+    out = set()
+    for part in raw.split(","):
+        try:
+            out.add(int(part.strip()))
+        except ValueError:
+            pass
+    return sorted(out) or [1_500_000]
+
+
+def _mat_windows(last: int):
+    """En yeni haftada biten standart pencereler + tüm demo pencereleri."""
+    wins = {(last - n + 1, last) for n in UPTREND_MAT_WINDOWS if last - n + 1 >= 1}
+    wins |= {(s, s + DEMO_WEEKS - 1) for s in range(1, last - DEMO_WEEKS + 2)}
+    return wins
+
+
+def _update_uptrend_mat(con, first_changed):
+    """
+    first_changed: verisi ya da week_id'si değişen ilk hafta (None = hiçbiri).
+    Bu haftadan önce biten pencereler aynen kalır; artık hedef olmayanlar
+    silinir, eksikler hesaplanır.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS uptrend_mat_windows(
+          start_id INTEGER, end_id INTEGER, max_rank INTEGER, rank_ceiling INTEGER)
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS uptrend_mat(
+          start_id INTEGER, end_id INTEGER, max_rank INTEGER, pos INTEGER, term_id INTEGER,
+          term TEXT, start_rank INTEGER, end_rank INTEGER, total_improvement INTEGER, weeks INTEGER)
+    """)
+    if first_changed is not None:
+        con.execute("DELETE FROM uptrend_mat_windows WHERE end_id >= ?", [first_changed])
+        con.execute("DELETE FROM uptrend_mat WHERE end_id >= ?", [first_changed])
+
+    last = con.execute("SELECT COALESCE(MAX(week_id), 0) FROM weeks").fetchone()[0]
+    target = {(s, e, k) for s, e in _mat_windows(last) for k in uptrend_mat_max_ranks()}
+    existing = set(con.execute("SELECT start_id, end_id, max_rank FROM uptrend_mat_windows").fetchall())
+    for key in existing - target:
+        con.execute("DELETE FROM uptrend_mat_windows WHERE start_id = ? AND end_id = ? AND max_rank = ?", list(key))
+        con.execute("DELETE FROM uptrend_mat WHERE start_id = ? AND end_id = ? AND max_rank = ?", list(key))
+
+    missing = sorted(target - existing, key=lambda k: (k[1], k[0], k[2]))
+    if not missing:
+        return
+    week_max = dict(con.execute("SELECT week_id, MAX(rank) FROM ranks GROUP BY week_id").fetchall())
+    for start_id, end_id, max_rank in missing:
+        con.execute(f"""
+            INSERT INTO uptrend_mat
+            WITH {_uptrend_ctes_sql(con, start_id, end_id, "")}
+            SELECT ?, ?, ?,
+                   ROW_NUMBER() OVER (ORDER BY u.total_improvement DESC, u.end_rank ASC, t.term),
+                   u.term_id, t.term, u.start_rank, u.end_rank, u.total_improvement, u.weeks
+            FROM uptrends u
+            JOIN terms t USING(term_id)
+        """, [CLEAN_MASK, start_id, end_id, max_rank, start_id, end_id, max_rank])
+        ceiling = max((week_max.get(w) or 0) for w in range(start_id, end_id + 1))
+        con.execute("INSERT INTO uptrend_mat_windows VALUES (?, ?, ?, ?)", [start_id, end_id, max_rank, ceiling])
+    print(f"↻ uptrend windows materialized: {len(missing)}")
+
+
+_mat_windows_cache = {}  # sürüm klasörü -> {(start_id, end_id): [(max_rank, rank_ceiling)]}
+
+
+def _uptrend_mat_rank(con, start_id: int, end_id: int, max_rank: int):
+    """İsteği karşılayan materyalize pencerenin max_rank'ı ya da None."""
+    # yayınlanmış sürümler değişmez: pencere listesi sürüm klasörü başına önbellekte
+    version = getattr(con, "db_dir", None) if getattr(con, "version", None) else None
+    windows = _mat_windows_cache.get(version) if version else None
+    if windows is None:
+        try:
+            rows = con.execute("SELECT start_id, end_id, max_rank, rank_ceiling FROM uptrend_mat_windows").fetchall()
+        except duckdb.CatalogException:
+            rows = []  # materyalizasyondan önceki sürüm
+        windows = {}
+        for s, e, k, ceiling in rows:
+            windows.setdefault((s, e), []).append((k, ceiling))
+        if version:
+            _mat_windows_cache.clear()
+            _mat_windows_cache[version] = windows
+    candidates = windows.get((start_id, end_id), [])
+    for k, ceiling in candidates:
+        if k == max_rank:
+            return k
+    for k, ceiling in candidates:
+        if k >= ceiling and max_rank >= ceiling:
+            return k
+    return None
+
+
+# ---------------------------------------------------------------------
+# Yükleme
+# ---------------------------------------------------------------------
+def _drop_trend_tables(con):
+    for name in ("searches", "ranks"):
+        if _table_type(con, name) == "VIEW":
+            con.execute(f"DROP VIEW {name}")
+    for name in ("searches", "term_streaks", "term_tokens", "uptrend_mat", "uptrend_mat_windows",
+                 "trend_meta", "ingest_manifest", "ranks", "terms", "weeks"):
+        con.execute(f"DROP TABLE IF EXISTS {name}")
+    shutil.rmtree(_parquet_dir(con), ignore_errors=True)
+
+
+# ---------------------------------------------------------------------
+# Ingest manifest: ingest_manifest(file_name, content_hash, row_count, week_label, loaded_at)
+#   Sürümle birlikte taşınır. Hafta başına bir dosya: içeriği (md5) aynı
+#   olan hafta atlanır, değişen haftanın satırları silinip yeniden yüklenir.
+#   Yarıda kalan (çöken) build yayınlanmaz; tekrar çalıştırıldığında yayındaki
+#   sürümün manifest'ine göre sadece eksik / değişen dosyalar yüklenir.
+# ---------------------------------------------------------------------
+def _file_hash(path: Path) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ingest_plan(con, items):
+    """
+    items: [(path, week_label, content_hash)]
+    Dönen: {"new": [...], "replace": [...], "skip": [...]} (aynı tuple'lar)
+    Manifest'te kaydı olmayan ama weeks'te bulunan hafta (eski sürüm) değişmiş sayılır.
+    """
+    known = dict(con.execute("SELECT week_label, content_hash FROM ingest_manifest").fetchall())
+    weeks = {r[0] for r in con.execute("SELECT label FROM weeks").fetchall()}
+    plan = {"new": [], "replace": [], "skip": []}
+    for item in items:
+        _, label, digest = item
+        if known.get(label) == digest:
+            plan["skip"].append(item)
+        elif label in weeks:
+            plan["replace"].append(item)
+        else:
+            plan["new"].append(item)
+    return plan
+
+
+def _drop_week_rows(con, label: str):
+    """Haftanın rank satırlarını siler (week_id'ler değişmez, hafta yeniden yüklenecek)."""
+    if _parquet_ranks(con):
+        _week_file(con, label).unlink(missing_ok=True)
+        manifest = _load_parquet_manifest(con)
+        manifest["weeks"].pop(label, None)
+        _save_parquet_manifest(con, manifest)
+    else:
+        con.execute("DELETE FROM ranks WHERE week_id = (SELECT week_id FROM weeks WHERE label = ?)", [label])
+
+
+def _record_ingest(con, items, file_rows):
+    """Yüklenen dosyaları manifest'e yazar (aynı hafta / dosya adının eski kaydı silinir)."""
+    for path, label, digest in items:
+        name = Path(path).name
+        con.execute("DELETE FROM ingest_manifest WHERE file_name = ? OR week_label = ?", [name, label])
+        con.execute(
+            "INSERT INTO ingest_manifest VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+            [name, digest, int(file_rows.get(label, 0)), label],
+        )
+
+
+def _hash_files(paths, progress):
+    items = []
+    for i, p in enumerate(paths, 1):
+        progress(phase="hash", files_total=len(paths), files_done=i - 1, current_file=p.name)
+        items.append((p, p.stem, _file_hash(p)))
+    return items
+
+
+def init_full(project_root: Path, progress=None):
+    """
+    data/raw altındaki TÜM CSV'leri yeni bir veri seti sürümüne baştan yükler;
+    yayındaki sürüm, yenisi doğrulanıp yayınlanana kadar okunmaya devam eder.
+    progress(**alanlar): ilerleme bildirimi (bkz. jobs.Job.update)
+    """
+    progress = progress or _no_progress
+    raw = Path(project_root) / "data" / "raw"
+    files = sorted(raw.glob("*.csv"))
+    t0 = time.perf_counter()
+    items = _hash_files(files, progress)
+    with build_dataset(progress=progress) as con:
+        create_trend_schema(con)
+        rows = load_week_csvs(con, STAGE_TABLE, files, progress)
+        t_load = time.perf_counter() - t0
+        progress(phase="ingest")
+        file_rows = dict(con.execute(f"SELECT week, COUNT(*) FROM {STAGE_TABLE} GROUP BY week").fetchall())
+        ingest_stage(con, STAGE_TABLE)
+        _record_ingest(con, items, file_rows)
+        con.execute(f"DROP TABLE {STAGE_TABLE}")
+    total = time.perf_counter() - t0
+    print(f"⏱️ init_full: {len(files)} files, {rows} rows in {total:.2f}s (csv load {t_load:.2f}s)")
+    return {"dataset": current_version(), "files": len(files), "rows": rows, "seconds": round(total, 2)}
+
+
+def sync_raw(project_root: Path, progress=None):
+    """
+    data/raw'daki CSV'leri yayındaki sürümün manifest'iyle karşılaştırır ve
+    sadece yeni / içeriği değişen haftaları yayındaki sürümün kopyasına yükler.
+    Yapılacak iş yoksa yeni sürüm açılmaz.
+    """
+    progress = progress or _no_progress
+    raw = Path(project_root) / "data" / "raw"
+    files = sorted(raw.glob("*.csv"))
+    t0 = time.perf_counter()
+    items = _hash_files(files, progress)
+    con = dataset_conn()
+    plan = _ingest_plan(con, items)
     con.close()
+    if not (plan["new"] or plan["replace"]):
+        print(f"✅ sync: {len(files)} files up to date")
+        return {"dataset": current_version(), "files": len(files), "skipped": len(files),
+                "loaded": 0, "replaced": 0, "rows": 0, "seconds": round(time.perf_counter() - t0, 2)}
+
+    with build_dataset(base=True, progress=progress) as con:
+        create_trend_schema(con)
+        # kilit beklenirken başka bir build yüklemiş olabilir: kopyaya göre yeniden planla
+        plan = _ingest_plan(con, items)
+        todo = plan["new"] + plan["replace"]
+        for _, label, _ in plan["replace"]:
+            _drop_week_rows(con, label)
+        rows = load_week_csvs(con, STAGE_TABLE, [p for p, _, _ in todo], progress)
+        progress(phase="ingest")
+        file_rows = dict(con.execute(f"SELECT week, COUNT(*) FROM {STAGE_TABLE} GROUP BY week").fetchall())
+        ingest_stage(con, STAGE_TABLE)
+        _record_ingest(con, todo, file_rows)
+        con.execute(f"DROP TABLE {STAGE_TABLE}")
+    total = time.perf_counter() - t0
+    print(f"⏱️ sync: {len(plan['new'])} new, {len(plan['replace'])} replaced, "
+          f"{len(plan['skip'])} unchanged; {rows} rows in {total:.2f}s")
+    return {"dataset": current_version(), "files": len(files), "skipped": len(plan["skip"]),
+            "loaded": len(plan["new"]), "replaced": len(plan["replace"]), "rows": rows,
+            "seconds": round(total, 2)}
+
+
+def append_week(week_csv_path: str, week_label: str, progress=None):
+    """
+    Tek haftayı (CSV) yayındaki sürümün kopyasına ekler ve kopyayı yayınlar.
+    Aynı içerik zaten yüklüyse bir şey yapmaz; hafta farklı içerikle
+    yüklüyse satırları yenisiyle değiştirilir.
+    """
+    progress = progress or _no_progress
+    path = Path(week_csv_path)
+    t0 = time.perf_counter()
+    progress(phase="hash", files_total=1, files_done=0, current_file=path.name)
+    item = (path, week_label, _file_hash(path))
+    con = dataset_conn()
+    plan = _ingest_plan(con, [item])
+    con.close()
+    if plan["skip"]:
+        print(f"✅ append_week: {week_label} already loaded ({path.name}), skipped")
+        return {"dataset": current_version(), "week": week_label, "rows": 0, "skipped": True,
+                "seconds": round(time.perf_counter() - t0, 2)}
+
+    with build_dataset(base=True, progress=progress) as con:
+        create_trend_schema(con)
+        replace = bool(_ingest_plan(con, [item])["replace"])
+        if replace:
+            _drop_week_rows(con, week_label)
+        con.execute(f"CREATE OR REPLACE TABLE {STAGE_TABLE}(week TEXT, term TEXT, rank INTEGER)")
+        progress(phase="load", files_total=1, files_done=0, current_file=path.name)
+        insert_week_csv(con, STAGE_TABLE, path, week_label)
+        rows = con.execute(f"SELECT COUNT(*) FROM {STAGE_TABLE}").fetchone()[0]
+        progress(phase="ingest", files_done=1, rows=rows, file_rows={week_label: rows})
+        ingest_stage(con, STAGE_TABLE)
+        _record_ingest(con, [item], {week_label: rows})
+        con.execute(f"DROP TABLE {STAGE_TABLE}")
+    return {"dataset": current_version(), "week": week_label, "rows": rows, "skipped": False,
+            "replaced": replace, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+# ---------------------------------------------------------------------
+# API sorguları (/weeks, /uptrends, /series, /diag)
+# ---------------------------------------------------------------------
+def _term_filter_sql(include: str, exclude: str, id_col: str, text_col: str):
+    """
+    include/exclude için ek WHERE parçası + parametreleri döner.
+    Harflerden oluşan kelimeler term_tokens posting'lerinden (semi/anti join),
+    diğerleri eski regex ile eşleşir.
+    """
+    import re
+
+    # include/exclude stringlerini parçala
+    def _parts_space(s: str):
+        parts = re.split(r"[,\s]+", s or "")
+        return [p.strip().lower() for p in parts if p.strip()]
+
+    def _is_token(w: str) -> bool:
+        return re.fullmatch(r"[a-z]+", w) is not None
+
+    sql, params = "", []
+    inc = _parts_space(include) if include else []
+    exc = _parts_space(exclude) if exclude else []
+
+    # ✅ INCLUDE: kelime bazlı eşleşme (trumpet sorunu çözülüyor) — hepsi geçmeli
+    inc_tokens = sorted({w for w in inc if _is_token(w)})
+    if inc_tokens:
+        marks = ", ".join("?" * len(inc_tokens))
+        sql += f"""
+          AND {id_col} IN (
+            SELECT term_id FROM term_tokens WHERE token IN ({marks})
+            GROUP BY term_id HAVING COUNT(DISTINCT token) = ?
+          )"""
+        params.extend(inc_tokens)
+        params.append(len(inc_tokens))
+    for w in inc:
+        if not _is_token(w):
+            pattern = rf"(^|[^a-z]){re.escape(w)}([^a-z]|$)"
+            sql += f" AND REGEXP_MATCHES(LOWER({text_col}), ?)"
+            params.append(pattern)
+
+    # ✅ EXCLUDE: aynı mantıkla hariç tut
+    exc_tokens = sorted({w for w in exc if _is_token(w)})
+    if exc_tokens:
+        marks = ", ".join("?" * len(exc_tokens))
+        sql += f" AND {id_col} NOT IN (SELECT term_id FROM term_tokens WHERE token IN ({marks}))"
+        params.extend(exc_tokens)
+    for w in exc:
+        if not _is_token(w):
+            pattern = rf"(^|[^a-z]){re.escape(w)}([^a-z]|$)"
+            sql += f" AND NOT REGEXP_MATCHES(LOWER({text_col}), ?)"
+            params.append(pattern)
+
+    return sql, params
+
+
+def fetch_weeks(con):
+    """[(week_id, label)] — week_id sırasıyla."""
+    return con.execute("SELECT week_id, label FROM weeks ORDER BY week_id").fetchall()
+
+
+def _keyset_sql(after, impr_col: str, end_col: str, term_col: str):
+    """
+    after = (total_improvement, end_rank, term): sıralamada bu satırdan
+    SONRAKİ satırlar (total_improvement DESC, end_rank ASC, term ASC).
+    """
+    if after is None:
+        return "", []
+    impr, end_rank, term = after
+    sql = f"""
+          AND ({impr_col} < ? OR ({impr_col} = ? AND ({end_col} > ? OR ({end_col} = ? AND {term_col} > ?))))"""
+    return sql, [impr, impr, end_rank, end_rank, term]
+
+
+def fetch_uptrends(con, start_id: int, end_id: int, include: str, exclude: str,
+                   max_rank: int, limit: int, offset: int, strict: bool = False, after=None):
+    """
+    [(term, start_rank, end_rank, total_improvement, weeks)]
+    strict: her hafta mevcut + her adımda iyileşme (term_streaks index'i);
+    aksi halde pencerede >= 2 kez görülen ve ilk görüldüğü haftadan son
+    görüldüğü haftaya iyileşen term'ler.
+    Sıra: total_improvement DESC, end_rank ASC, term ASC.
+    after: (total_improvement, end_rank, term) — keyset sayfalama, bu
+    satırdan sonrası (offset yerine; bkz. _keyset_sql).
+    """
+    q = _uptrends_sql(con, start_id, end_id, include, exclude, max_rank, limit, offset, strict, after)
+    if q is None:
+        return []
+    return [r[:5] for r in con.execute(*q).fetchall()]
+
+
+def iter_uptrends(con, start_id: int, end_id: int, include: str, exclude: str,
+                  max_rank: int, limit: int, strict: bool = False, weekly: bool = False,
+                  batch: int = 2000):
+    """
+    Export için fetch_uptrends sonucu, cursor'dan batch batch (sonuç Python'da
+    tutulmaz). weekly: satır sonuna penceredeki her hafta için rank
+    (/series gibi rank <= max_rank, yoksa None). Batch (satır listesi) iterator'ı döner.
+
+    Sorgu ve ilk batch burada (eager) çalışır: SQL hatası çağıranın
+    try/except'ine düşer, yanıt akmaya başladıktan sonra değil.
+    """
+    q = _uptrends_sql(con, start_id, end_id, include, exclude, max_rank, limit, 0, strict, None)
+    if q is None:
+        return iter(())
+    sql, params = q
+    if weekly:
+        cols = ", ".join(
+            f"MIN(r.rank) FILTER (WHERE r.week_id = {w}) AS w{w}" for w in range(int(start_id), int(end_id) + 1)
+        )
+        sql = f"""
+        WITH x AS ({sql}),
+        wk AS (
+          SELECT r.term_id, {cols}
+          FROM {ranks_window(con, start_id, end_id)} r
+          WHERE r.term_id IN (SELECT term_id FROM x) AND r.rank <= ?
+          GROUP BY r.term_id
+        )
+        SELECT x.*, {", ".join(f"wk.w{w}" for w in range(int(start_id), int(end_id) + 1))}
+        FROM x LEFT JOIN wk USING(term_id)
+        ORDER BY x.total_improvement DESC, x.end_rank ASC, x.term
+        """
+        params = [*params, max_rank]
+    else:
+        sql = f"SELECT * FROM ({sql}) x ORDER BY x.total_improvement DESC, x.end_rank ASC, x.term"
+    cur = con.execute(sql, params)
+    return _uptrend_batches(cur, cur.fetchmany(batch), batch)
+
+
+def _uptrend_batches(cur, rows, batch: int):
+    while rows:
+        # term_id (6. kolon) dışarı verilmez
+        yield [r[:5] + r[6:] for r in rows]
+        rows = cur.fetchmany(batch)
+
+
+def _uptrends_sql(con, start_id, end_id, include, exclude, max_rank, limit, offset, strict, after):
+    """
+    fetch_uptrends'in (sql, params)'ı; kolonlar: term, start_rank, end_rank,
+    total_improvement, weeks, term_id. Sonuç yoksa None.
+    """
+    if strict:
+        weeks_n = end_id - start_id + 1
+        if weeks_n < 2:
+            return None
+        filt_sql, filt_params = _term_filter_sql(include, exclude, "t.term_id", "t.term")
+        key_sql, key_params = _keyset_sql(after, "(s.rank - e.rank)", "e.rank", "t.term")
+        sql = f"""
+        SELECT t.term,
+               s.rank::BIGINT AS start_rank,
+               e.rank::BIGINT AS end_rank,
+               (s.rank - e.rank)::BIGINT AS total_improvement,
+               ?::BIGINT AS weeks,
+               t.term_id
+        FROM term_streaks e
+        JOIN term_streaks s ON s.term_id = e.term_id AND s.week_id = ?
+        JOIN terms t ON t.term_id = e.term_id
+        WHERE e.week_id = ?
+          AND e.up_run >= ?
+          AND s.rank <= ?
+          AND t.flags & ? = 0
+          {filt_sql}{key_sql}
+        ORDER BY total_improvement DESC, end_rank ASC, t.term
+        LIMIT ? OFFSET ?
+        """
+        params = [weeks_n, start_id, end_id, weeks_n, max_rank, CLEAN_MASK, *filt_params, *key_params,
+                  limit, offset]
+        return sql, params
+
+    mat_rank = _uptrend_mat_rank(con, start_id, end_id, max_rank)
+    if mat_rank is not None:
+        # materyalize pencere: sıralı tam liste üzerinde filtre + sayfa
+        filt_sql, filt_params = _term_filter_sql(include, exclude, "m.term_id", "m.term")
+        key_sql, key_params = _keyset_sql(after, "m.total_improvement", "m.end_rank", "m.term")
+        sql = f"""
+        SELECT m.term,
+               m.start_rank::BIGINT AS start_rank, m.end_rank::BIGINT AS end_rank,
+               m.total_improvement::BIGINT AS total_improvement, m.weeks::BIGINT AS weeks,
+               m.term_id
+        FROM uptrend_mat m
+        WHERE m.start_id = ? AND m.end_id = ? AND m.max_rank = ?
+          {filt_sql}{key_sql}
+        ORDER BY m.pos
+        LIMIT ? OFFSET ?
+        """
+        params = [start_id, end_id, mat_rank, *filt_params, *key_params, limit, offset]
+        return sql, params
+
+    filt_sql, filt_params = _term_filter_sql(include, exclude, "t.term_id", "t.term")
+    key_sql, key_params = _keyset_sql(after, "u.total_improvement", "u.end_rank", "t.term")
+    sql = f"""
+    WITH {_uptrend_ctes_sql(con, start_id, end_id, filt_sql)}
+    SELECT t.term, u.start_rank, u.end_rank, u.total_improvement, u.weeks, u.term_id
+    FROM uptrends u
+    JOIN terms t USING(term_id)
+    WHERE true {key_sql}
+    ORDER BY u.total_improvement DESC, u.end_rank ASC, t.term
+    LIMIT ? OFFSET ?
+    """
+    params = [CLEAN_MASK, *filt_params, start_id, end_id, max_rank, *key_params, limit, offset]
+    return sql, params
+
+
+def _uptrend_ctes_sql(con, start_id: int, end_id: int, filt_sql: str) -> str:
+    """
+    Strict olmayan uptrend hesabının CTE'leri; son CTE
+    uptrends(term_id, start_rank, end_rank, total_improvement, weeks), sırasız.
+    Parametreler: CLEAN_MASK, *filtre, start_id, end_id, max_rank
+    """
+    return f"""cand AS (
+      SELECT t.term_id FROM terms t
+      WHERE t.flags & ? = 0 {filt_sql}
+    ),
+    filtered AS (
+      SELECT r.term_id, r.rank, r.week_id
+      FROM {ranks_window(con, start_id, end_id)} r
+      JOIN cand USING(term_id)
+      WHERE r.week_id BETWEEN ? AND ?
+        AND r.rank IS NOT NULL
+        AND r.rank <= ?
+    ),
+    start_end AS (
+      -- ilk / son görüldüğü haftadaki rank (aynı haftada birden çok satır
+      -- varsa büyüğü) tek geçişte: anahtar = week_id * 2^32 -/+ rank
+      SELECT term_id,
+             arg_min(rank, week_id::BIGINT * 4294967296 - rank) AS start_rank,
+             arg_max(rank, week_id::BIGINT * 4294967296 + rank) AS end_rank,
+             COUNT(*) AS weeks
+      FROM filtered
+      GROUP BY term_id
+      HAVING COUNT(*) >= 2
+    ),
+    uptrends AS (
+      SELECT term_id,
+             start_rank::BIGINT AS start_rank,
+             end_rank::BIGINT AS end_rank,
+             (start_rank - end_rank)::BIGINT AS total_improvement,
+             weeks::BIGINT AS weeks
+      FROM start_end
+      WHERE start_rank IS NOT NULL
+        AND end_rank   IS NOT NULL
+        AND start_rank > end_rank
+    )"""
+
+
+def fetch_series(con, term: str, start_id: int, end_id: int, max_rank: int):
+    """[(week_label, rank)] — penceredeki her hafta için (term yoksa rank None)."""
+    # term_id'ler önce çözülür: sabit IN listesi fact taramasına (Parquet row
+    # group / DuckDB zonemap istatistiklerine) itilebilir, alt sorgu itilemez
+    ids = [r[0] for r in con.execute(
+        "SELECT term_id FROM terms WHERE term_norm = LOWER(TRIM(?)) AND flags & ? = 0",
+        [term, CLEAN_MASK],
+    ).fetchall()]
+    if not ids:
+        # eşleşen term yok: fact tablosuna hiç dokunmadan boş seri
+        return [(label, None) for label, in con.execute(
+            "SELECT label FROM weeks WHERE week_id BETWEEN ? AND ? ORDER BY week_id",
+            [start_id, end_id],
+        ).fetchall()]
+    id_list = ", ".join(str(int(i)) for i in ids)
+    return con.execute(f"""
+        SELECT w.label, r.rank
+        FROM weeks w
+        LEFT JOIN (
+          SELECT r.week_id, r.rank
+          FROM {ranks_window(con, start_id, end_id)} r
+          WHERE r.term_id IN ({id_list})
+            AND r.rank IS NOT NULL AND r.rank <= ?
+        ) r ON r.week_id = w.week_id
+        WHERE w.week_id BETWEEN ? AND ?
+        ORDER BY w.week_id
+    """, [max_rank, start_id, end_id]).fetchall()
+
+
+def fetch_diag(con):
+    """(satır sayısı, hafta sayısı, örnek temiz term'ler)"""
+    rows = con.execute("SELECT COUNT(*) FROM ranks").fetchone()[0]
+    weeks = con.execute("SELECT COUNT(*) FROM weeks").fetchone()[0]
+    sample = con.execute(
+        "SELECT term FROM terms WHERE flags & ? = 0 LIMIT 5", [JUNK_MASK]
+    ).fetchall()
+    return rows, weeks, [r[0] for r in sample]
@@ -0,0 +1,157 @@
+"""
+jobs.py — uzun süren işler (reindex) için süreç içi arka plan kuyruğu.
+
+init_full / append_week istek thread'inde değil, tek bir worker thread'inde
+çalışır: /reindex hemen job id döner, site (/health dahil) yanıt vermeye
+devam eder; /reindex/status/<id> ilerlemeyi gösterir.
+
+- Aynı anahtarlı (ör. "full", "append:<week>") bir iş kuyrukta ya da
+  çalışıyorsa yeni iş açılmaz, mevcut iş döner (coalescing).
+- İşler sırayla çalışır; süreçler arası sıralama db.build_dataset'in
+  flock'u ile sağlanır. Durum bilgisi süreç belleğindedir (worker başına).
+- İş fonksiyonu job.update(...) ile ilerleme bildirir: phase, files_total,
+  files_done, current_file, rows, file_rows.
+"""
+
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+MAX_FINISHED = 50  # bellekte tutulan bitmiş iş sayısı
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    def __init__(self, kind: str, key: str, fn: Callable, params: Dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.params = params
+        self.fn = fn
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.coalesced = 0  # bu işe katılan tekrar istek sayısı
+        self.error: Optional[str] = None
+        self.result = None
+        # ilerleme
+        self.phase = "queued"
+        self.files_total = 0
+        self.files_done = 0
+        self.current_file: Optional[str] = None
+        self.rows = 0
+        self.file_rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def update(self, **fields):
+        """İlerleme alanlarını günceller (iş fonksiyonu çağırır)."""
+        with self._lock:
+            file_rows = fields.pop("file_rows", None)
+            if file_rows:
+                self.file_rows.update(file_rows)
+            for k, v in fields.items():
+                setattr(self, k, v)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "phase": self.phase,
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "current_file": self.current_file,
+                "rows": self.rows,
+                "file_rows": dict(self.file_rows),
+                "rows_per_sec": round(self.rows / elapsed) if elapsed > 0 else None,
+                "elapsed_sec": round(elapsed, 2),
+                "queued_sec": round((self.started_at or end) - self.created_at, 2),
+                "coalesced": self.coalesced,
+                "error": self.error,
+                "result": self.result,
+            }
+
+
+class JobRunner:
+    """Tek worker thread'li iş kuyruğu; thread ilk submit'te başlar."""
+
+    def __init__(self, name: str = "jobs"):
+        self.name = name
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}  # key -> bitmemiş iş
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, kind: str, key: str, fn: Callable, **params) -> Tuple[Job, bool]:
+        """
+        fn(job) işini kuyruğa ekler. Dönen: (job, yeni mi). Aynı anahtarlı
+        bitmemiş iş varsa o döner ve coalesced sayacı artar.
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and not job.finished:
+                job.coalesced += 1
+                return job, False
+            job = Job(kind, key, fn, params)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            self._trim()
+            self._ensure_worker()
+        self._queue.put(job)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self, n: int = 20):
+        with self._lock:
+            return list(self._jobs.values())[-n:][::-1]
+
+    def _trim(self):
+        finished = [j.id for j in self._jobs.values() if j.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._work, name=f"{self.name}-worker", daemon=True)
+            self._thread.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.update(status=RUNNING, phase="starting", started_at=time.time())
+            print(f"↻ job {job.id} ({job.kind}) started")
+            try:
+                result = job.fn(job)
+                job.update(status=DONE, phase="done", result=result, current_file=None)
+                print(f"✅ job {job.id} ({job.kind}) done in {time.time() - job.started_at:.2f}s")
+            except Exception as e:
+                job.update(status=FAILED, error=f"{type(e).__name__}: {e}")
+                print(f"⚠️ job {job.id} ({job.kind}) failed\n{traceback.format_exc()}")
+            finally:
+                job.update(finished_at=time.time())
+                with self._lock:
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+                self._queue.task_done()
+
+
+# uygulama geneli kuyruk (reindex)
+runner = JobRunner("reindex")
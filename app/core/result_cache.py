@@ -0,0 +1,145 @@
+"""
+result_cache.py — /uptrends ve /series JSON yanıtları için sonuç önbelleği.
+
+Veri haftada bir değişir; aynı parametrelerle gelen istekler DuckDB'ye
+gitmeden hazır JSON'u alır.
+
+- Anahtar: (tür, veri seti sürümü, normalize parametreler) md5'i. Sürüm
+  db.dataset_conn().version'dan gelir; /reindex yeni sürüm yayınlayınca eski
+  anahtarlar bir daha istenmez, eski sürümün kayıtları ilk fırsatta silinir.
+- Bellek: byte sınırlı LRU (RESULT_CACHE_MB, varsayılan 64; 0 = kapalı).
+- Disk (opsiyonel, RESULT_CACHE_DIR): aynı makinedeki worker'lar kayıtları
+  paylaşır. <dir>/<sürüm>/<anahtar[:2]>/<anahtar>.json, atomik yazılır.
+- Sayaçlar: hits, disk_hits, misses, puts, evictions (stats()).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+ENTRY_OVERHEAD = 128  # kayıt başına yaklaşık sözlük / anahtar maliyeti (byte)
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.puts = self.evictions = 0
+
+    @staticmethod
+    def key(kind: str, version: str, params: Dict) -> str:
+        raw = json.dumps([kind, version, params], sort_keys=True, separators=(",", ":"))
+        return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, version: str) -> Optional[bytes]:
+        """Kayıt yoksa None (miss sayılır)."""
+        with self._lock:
+            self._switch_version(version)
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+        body = self._disk_read(key, version)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, body)
+        return body
+
+    def put(self, key: str, version: str, body: bytes):
+        with self._lock:
+            self._switch_version(version)
+            self.puts += 1
+            self._remember(key, body)
+        self._disk_write(key, version, body)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk": str(self.disk_dir) if self.disk_dir else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "puts": self.puts,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+            }
+
+    # -----------------------------------------------------------------
+    def _switch_version(self, version: str):
+        """Yeni sürüm görülünce eski sürümün kayıtları (bellek + disk) atılır."""
+        if version == self._version:
+            return
+        self.evictions += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+        if self.disk_dir and self.disk_dir.is_dir():
+            # sürüm adları zaman damgasıyla başlar: sadece daha eskiler silinir
+            # (diğer worker'lar yeni sürümü yazıyor olabilir)
+            for p in self.disk_dir.iterdir():
+                if p.is_dir() and p.name < version:
+                    shutil.rmtree(p, ignore_errors=True)
+
+    def _remember(self, key: str, body: bytes):
+        size = len(body) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old) + len(key) + ENTRY_OVERHEAD
+        self._entries[key] = body
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            k, v = self._entries.popitem(last=False)
+            self._bytes -= len(v) + len(k) + ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def _disk_path(self, key: str, version: str) -> Path:
+        return self.disk_dir / version / key[:2] / f"{key}.json"
+
+    def _disk_read(self, key: str, version: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        try:
+            return self._disk_path(key, version).read_bytes()
+        except OSError:
+            return None
+
+    def _disk_write(self, key: str, version: str, body: bytes):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key, version)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ result cache disk write failed: {e}")
+
+
+def _from_env() -> ResultCache:
+    mb = float(os.environ.get("RESULT_CACHE_MB", "64") or 0)
+    return ResultCache(int(mb * 1024 * 1024), os.environ.get("RESULT_CACHE_DIR") or None)
+
+
+# uygulama geneli önbellek (/uptrends, /series)
+cache = _from_env()
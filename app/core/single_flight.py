@@ -0,0 +1,77 @@
+"""
+single_flight.py — aynı anda gelen özdeş ağır sorguların tek sefer çalışması.
+
+Bülten gibi ani trafikte aynı /uptrends isteği saniyeler içinde onlarca kez
+gelir. İlk istek sorguyu çalıştırır; o bitene kadar gelen aynı anahtarlı
+istekler bekler ve aynı sonucu (ya da aynı hatayı) alır. Bitince anahtar
+silinir: sonraki istekler sonuç önbelleğinden (result_cache) beslenir.
+
+Süreç içidir (worker başına); gunicorn gthread worker'ında thread'ler arası
+çalışır. Sayaçlar: executed, coalesced, errors, in_flight (stats()).
+"""
+
+import threading
+from typing import Callable, Dict, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = self.coalesced = self.errors = 0
+
+    def do(self, key: str, fn: Callable) -> Tuple[object, bool]:
+        """fn()'i anahtar başına tek sefer çalıştırır. Dönen: (sonuç, paylaşıldı mı)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "in_flight": len(self._calls),
+                "waiting": sum(c.waiters for c in self._calls.values()),
+            }
+
+
+# uygulama geneli (/uptrends, /series)
+flights = SingleFlight()
@@ -10,11 +10,17 @@ from __future__ import annotations
 import os
 import re
 import csv
+import codecs
+import itertools
+import json
+import time
 import hashlib
-import pickle
 from pathlib import Path
 from datetime import date
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 
 # ---------------------------------------------------------------------
 # Dosya adı paterni: US_Top_Search_Terms_Simple_Week_YYYY_MM_DD.csv
@@ -24,6 +30,34 @@ DATE_RE = re.compile(
     re.I
 )
 
+# include/exclude token'ları: _word_hit'teki \b sınırlarıyla aynı \w koşuları
+TOKEN_RE = re.compile(r"\w+")
+
+# Rank matrisinde "bu hafta yok" işareti (Brand Analytics rank'ları 1'den başlar)
+MISSING_RANK = 0
+
+# TrendIndex yapısı değiştikçe artırılır (eski cache dosyaları kullanılmaz)
+INDEX_VERSION = 6
+
+# Term geçerlilik bayrakları: ingest'te term başına bir kez hesaplanır.
+# db.terms.flags ile aynı bitler (SQL karşılığı: db._TERM_FLAGS_SQL).
+TERM_SHORT      = 1   # TRIM sonrası 2 karakterden kısa
+TERM_UNCASED    = 2   # büyük/küçük harfi olan karakter yok (LOWER = UPPER)
+TERM_FORMULA    = 4   # Excel/formül hatası (#NAME?, #REF!, ...)
+TERM_NUMERIC    = 8   # tamamen sayısal / bilimsel format (9.78E+12, -3.2)
+TERM_NO_LETTERS = 16  # hiç ASCII harf yok
+JUNK_MASK = TERM_FORMULA | TERM_NUMERIC | TERM_SHORT | TERM_NO_LETTERS
+
+_NUMERIC_RE = re.compile(r"[0-9.eE+\-]+")
+_LETTER_RE = re.compile(r"[A-Za-z]")
+
+# CSV başlığı bu kadar satır içinde aranır; encoding ilk bu kadar byte'tan tahmin edilir
+HEADER_SCAN_LINES = 200
+ENCODING_PROBE_BYTES = 64 * 1024
+
+# Bir haftanın rank'ları: {term: rank} ya da kompakt (terms, int32 ranks)
+WeekRanks = Union[Dict[str, int], Tuple[List[str], np.ndarray]]
+
 # ---------------------------------------------------------------------
 # Disk Cache Yardımcıları
 # ---------------------------------------------------------------------
@@ -40,34 +74,121 @@ def _files_signature(raw_dir: str) -> str:
     return hashlib.md5("|".join(names).encode()).hexdigest()
 
 
-def build_index_cached(project_root: str) -> "TrendIndex":
+def _file_fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _load_manifest(path: Path) -> Dict:
+    try:
+        m = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    # Farklı INDEX_VERSION'la yazılmış manifest / segment'ler kullanılmaz
+    return m if m.get("version") == INDEX_VERSION else {}
+
+
+def build_index_cached(
+    project_root: str,
+    workers: Optional[int] = None,
+    stats: Optional[Dict] = None
+) -> "TrendIndex":
     """
-    CSV içerikleri değişmediği sürece index’i pickle’dan yükler.
-    Cache deserialize hatasında otomatik yeniden inşa eder.
+    Index'i data/store altında artımlı olarak güncel tutar:
+      - manifest.json: dosya başına parmak izi (boyut + mtime) ve segment adı
+      - segments/: her haftanın parse edilmiş hali
+      - index_v*_<imza>.bin: mmap ile açılan index (bkz. trend_store)
+    Yalnızca yeni / değişen CSV'ler parse edilir ve mevcut index'e birleştirilir
+    (araya giren haftada weekId'ler yeniden atanır). Hiçbir şey değişmediyse
+    mevcut index dosyası doğrudan açılır. workers / stats: bkz. build_index.
     """
+    from app.core.trend_store import (
+        open_index, save_index, thaw_index, save_segment, load_segment,
+    )
+
     raw_dir = os.path.join(project_root, "data", "raw")
     store   = Path(project_root) / "data" / "store"
-    store.mkdir(parents=True, exist_ok=True)
+    seg_dir = store / "segments"
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = store / "manifest.json"
 
-    sig = _files_signature(raw_dir)
-    cache = store / f"index_{sig}.pkl"
+    files = _list_week_files(raw_dir)
+    fps = {os.path.basename(p): _file_fingerprint(p) for _, p in files}
+    manifest = _load_manifest(manifest_path)
+    known: Dict[str, Dict] = manifest.get("files", {})
+    changed = {n for n, fp in fps.items() if known.get(n, {}).get("fp") != fp}
 
-    if cache.exists():
+    base: Optional[TrendIndex] = None
+    if manifest.get("index") and (store / manifest["index"]).exists():
         try:
-            return pickle.loads(cache.read_bytes())
+            base = open_index(store / manifest["index"])
         except Exception as e:
-            # Bozuk / uyumsuz cache durumunda sıfırdan üret
-            print("⚠️ Cache deserialize failed, rebuilding:", e)
+            # Bozuk / uyumsuz cache durumunda segment'lerden yeniden üret
+            print("⚠️ Cache open failed, rebuilding:", e)
+    if base is not None and not changed and set(fps) == set(known):
+        return base
 
-    idx = build_index(project_root)
-    cache.write_bytes(pickle.dumps(idx, protocol=pickle.HIGHEST_PROTOCOL))
-    return idx
+    if len(files) < 2:
+        raise RuntimeError("En az 2 hafta CSV gerekli (data/raw/).")
+
+    t0 = time.perf_counter()
+
+    def _segment(path: str) -> Path:
+        return seg_dir / f"{os.path.basename(path)}.npz"
+
+    def _must_parse(path: str) -> bool:
+        return os.path.basename(path) in changed or (base is None and not _segment(path).exists())
+
+    payloads = _week_payloads(
+        files,
+        parse=_must_parse,
+        # Değişmeyen haftalar: mevcut index satırı (None) ya da segment
+        other=(lambda p: None) if base is not None else (lambda p: load_segment(_segment(p))),
+        workers=workers,
+        on_parsed=lambda p, terms, vals: save_segment(_segment(p), terms, vals),
+        stats=stats,
+    )
+    parsed = sum(1 for _, p in files if _must_parse(p))
+    idx = merge_weeks(thaw_index(base) if base is not None else TrendIndex(), payloads)
+
+    sig = _files_signature(raw_dir)
+    cache = store / f"index_v{INDEX_VERSION}_{sig}.bin"
+    save_index(idx, cache)
+
+    tmp = manifest_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps({
+        "version": INDEX_VERSION,
+        "index": cache.name,
+        "files": {n: {"fp": fp, "segment": f"{n}.npz"} for n, fp in fps.items()},
+    }, indent=2), encoding="utf-8")
+    os.replace(tmp, manifest_path)
+
+    # Eski index dosyaları ve silinen haftaların segment'leri (mmap'li okuyucular etkilenmez)
+    for old in store.glob("index_*"):
+        if old != cache and old.suffix in (".pkl", ".bin"):
+            old.unlink(missing_ok=True)
+    for seg in seg_dir.glob("*.npz"):
+        if seg.name[:-len(".npz")] not in fps:
+            seg.unlink(missing_ok=True)
+
+    total = time.perf_counter() - t0
+    if stats is not None:
+        stats["total_seconds"] = round(total, 4)
+    print(f"⏱️ index update: {parsed}/{len(files)} files parsed in {total:.2f}s")
+    return open_index(cache)
 
 
 # ---------------------------------------------------------------------
 # Veri Yapıları
 # ---------------------------------------------------------------------
 class TrendIndex:
+    """
+    Kolon bazlı index:
+      - terms[term_id] -> term, term_ids[term] -> term_id
+      - ranks: int32 (hafta × term) matrisi; satır = weekId - 1,
+        kayıp hücreler MISSING_RANK.
+    """
+
     def __init__(self):
         # weekId sıralı liste: [(weekId, yyyymmdd_date)]
         self.weeks: List[Tuple[int, date]] = []
@@ -75,8 +196,52 @@ class TrendIndex:
         self.weekid_to_date: Dict[int, date] = {}
         # etiketler (UI): weekId -> "Week {id} (YYYY-MM-DD)"
         self.week_labels: Dict[int, str] = {}
-        # term -> { weekId: rank }
-        self.term_ranks: Dict[str, Dict[int, int]] = {}
+        # term sözlüğü (term_id = ilk görüldüğü sıra)
+        self.terms: List[str] = []
+        self.term_ids: Optional[Dict[str, int]] = {}
+        # weeks × terms rank matrisi
+        self.ranks: np.ndarray = np.zeros((0, 0), dtype=np.int32)
+        # term_id -> geçerlilik bayrakları (bkz. term_flags)
+        self.flags: np.ndarray = np.zeros(0, dtype=np.uint8)
+        # streak index (hafta × term, uint16):
+        #   up_streak[w, t]      = w'de biten STRICT iyileşme serisinin hafta sayısı
+        #   present_streak[w, t] = w'de biten kesintisiz mevcudiyet serisi
+        # [s..e] strict uptrend  <=>  up_streak[e, t] >= e - s + 1
+        self.up_streak: np.ndarray = np.zeros((0, 0), dtype=np.uint16)
+        self.present_streak: np.ndarray = np.zeros((0, 0), dtype=np.uint16)
+        # token -> posting list (sıralı term_id'ler), CSR düzeninde:
+        #   postings[postings_offsets[k]:postings_offsets[k + 1]] = tokens[k]'yi içeren term'ler
+        self.tokens: List[str] = []
+        self.token_ids: Optional[Dict[str, int]] = {}
+        self.postings_offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.postings: np.ndarray = np.zeros(0, dtype=np.int32)
+
+    @property
+    def n_weeks(self) -> int:
+        return int(self.ranks.shape[0])
+
+    @property
+    def n_terms(self) -> int:
+        return int(self.ranks.shape[1])
+
+    def term_id(self, term: str) -> Optional[int]:
+        # mmap'ten açılan index'te sözlük yok; terms.find ikili arama yapar
+        if self.term_ids is None:
+            return self.terms.find(term)
+        return self.term_ids.get(term)
+
+    def postings_for(self, token: str) -> np.ndarray:
+        if self.token_ids is None:
+            k = self.tokens.find(token)
+        else:
+            k = self.token_ids.get(token)
+        if k is None:
+            return self.postings[:0]
+        return self.postings[self.postings_offsets[k]:self.postings_offsets[k + 1]]
+
+    def nbytes(self) -> int:
+        """Matris + term stringlerinin yaklaşık bellek kullanımı (byte)."""
+        return int(self.ranks.nbytes) + sum(len(t) for t in self.terms)
 
 
 # ---------------------------------------------------------------------
@@ -110,90 +275,350 @@ def _find_header_index(rows: List[List[str]]) -> Tuple[Optional[int], Optional[i
     return None, None, 0
 
 
-def _read_week_csv(path: str, encoding: str = "utf-8-sig") -> Dict[str, int]:
+def _detect_encoding(head: bytes) -> str:
     """
-    Amazon Brand Analytics CSV’lerini esnek şekilde okur.
-    - 'Reporting Range' / 'Select week' satırlarını atlar.
-    - Fazla virgül veya tırnak hatalarına toleranslıdır.
+    Dosyanın ilk birkaç KB'ından encoding tahmini: 'utf-8' ya da 'utf-16'
+    (DuckDB read_csv ENCODING değerleriyle aynı isimler).
     """
-    with open(path, "r", encoding=encoding, newline="") as f:
-        reader = list(csv.reader(f))
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # final=False: probe sonunda yarım kalan çok-byte'lı karakter hata sayılmaz
+        codecs.getincrementaldecoder("utf-8")("strict").decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "utf-16"
+
+
+def sniff_week_csv(
+    path: str,
+    max_lines: int = HEADER_SCAN_LINES,
+    probe_bytes: int = ENCODING_PROBE_BYTES
+) -> Tuple[str, Optional[int], str]:
+    """
+    Sadece dosyanın başını okuyarak (encoding, header_line_idx, delim) döner.
+    - encoding: ilk probe_bytes byte'tan
+    - header_line_idx: 'Search Term' + 'Search Frequency Rank' geçen satır (0-based),
+      ilk max_lines satırda yoksa None
+    - delim: başlık satırında TAB varsa '\t', yoksa ','
+    """
+    with open(path, "rb") as f:
+        enc = _detect_encoding(f.read(probe_bytes))
 
-    # Başlık tespiti
-    rank_idx, term_idx, start = _find_header_index(reader)
+    with open(path, "r", encoding=_py_encoding(enc), errors="replace", newline="") as f:
+        for i, line in enumerate(itertools.islice(f, max_lines)):
+            if "Search Term" in line and "Search Frequency Rank" in line:
+                return enc, i, "\t" if "\t" in line else ","
+    return enc, None, ","
 
-    # Fallback: ilk 15 satırda 'rank' ve 'term' geçen ilk iki kolonu kabullen
-    if start == 0:
-        for i, row in enumerate(reader[:15]):
-            cols = [c.strip().lower() for c in row if c and c.strip()]
-            if len(cols) >= 2 and "rank" in cols[0] and "term" in cols[1]:
-                rank_idx, term_idx, start = 0, 1, i + 1
-                break
 
-    out: Dict[str, int] = {}
+def _py_encoding(enc: str) -> str:
+    # utf-8 dosyalarda olası BOM Python tarafında atılsın
+    return "utf-8-sig" if enc == "utf-8" else enc
 
-    for row in reader[start:]:
-        if not row or len(row) < 2:
-            continue
 
-        try:
-            rank_raw = row[rank_idx].strip() if rank_idx is not None and rank_idx < len(row) else ""
-            term_raw = row[term_idx].strip() if term_idx is not None and term_idx < len(row) else ""
-        except Exception:
-            continue
+def _iter_week_rows(path: str, encoding: Optional[str] = None) -> Iterator[Tuple[str, int]]:
+    """
+    Amazon Brand Analytics CSV'sini akış halinde okur, (term, rank) üretir.
+    - Başlık yalnızca ilk HEADER_SCAN_LINES satırda aranır; 'Reporting Range' /
+      'Select week' satırları atlanır.
+    - Fazla virgül veya tırnak hatalarına toleranslıdır.
+    Dosya boyutundan bağımsız olarak bellekte en fazla başlık tamponu tutulur.
+    """
+    enc, _, delim = sniff_week_csv(path)
+    with open(path, "r", encoding=encoding or _py_encoding(enc), newline="") as f:
+        reader = csv.reader(f, delimiter=delim)
+        head = list(itertools.islice(reader, HEADER_SCAN_LINES))
+
+        # Başlık tespiti
+        rank_idx, term_idx, start = _find_header_index(head)
+
+        # Fallback: ilk 15 satırda 'rank' ve 'term' geçen ilk iki kolonu kabullen
+        if start == 0:
+            for i, row in enumerate(head[:15]):
+                cols = [c.strip().lower() for c in row if c and c.strip()]
+                if len(cols) >= 2 and "rank" in cols[0] and "term" in cols[1]:
+                    rank_idx, term_idx, start = 0, 1, i + 1
+                    break
+
+        if rank_idx is None or term_idx is None:
+            return
+
+        for row in itertools.chain(head[start:], reader):
+            if not row or len(row) < 2:
+                continue
+
+            rank_raw = row[rank_idx].strip() if rank_idx < len(row) else ""
+            term_raw = row[term_idx].strip() if term_idx < len(row) else ""
+            if not rank_raw or not term_raw:
+                continue
+
+            # Rank'ı sayıya çevir
+            try:
+                rank = int(rank_raw.replace(",", "").strip())
+            except Exception:
+                continue
+
+            term = term_raw.strip().lower()
+            if not term or term.startswith("search term"):
+                continue
+            # MISSING_RANK ile çakışmasın
+            if rank <= MISSING_RANK:
+                continue
+
+            yield term, rank
+
+
+def _read_week_csv(path: str, encoding: Optional[str] = None) -> Dict[str, int]:
+    """Haftanın {term: rank} sözlüğü; term tekrar ederse en iyi (en düşük) rank."""
+    out: Dict[str, int] = {}
+    for term, rank in _iter_week_rows(path, encoding):
+        if term not in out or rank < out[term]:
+            out[term] = rank
+    return out
 
-        if not rank_raw or not term_raw:
-            continue
 
-        # Rank'ı sayıya çevir
-        try:
-            rank = int(str(rank_raw).replace(",", "").strip())
-        except Exception:
-            continue
+def encode_terms(terms: Sequence[str]) -> Tuple[bytes, np.ndarray]:
+    """Term listesini kompakt forma çevirir: utf-8 blob + int64 offsets."""
+    encoded = [t.encode("utf-8") for t in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
 
-        term = term_raw.strip().lower()
-        if not term or term.startswith("search term"):
-            continue
 
-        # Aynı terim tekrar ederse en iyi (en düşük) rank'ı tut
-        if term not in out or rank < out[term]:
-            out[term] = rank
+def decode_terms(blob: bytes, offsets: np.ndarray) -> List[str]:
+    off = offsets.tolist()
+    return [blob[off[i]:off[i + 1]].decode("utf-8") for i in range(len(off) - 1)]
 
-    return out
+
+def _parse_week_file(path: str) -> Tuple[bytes, np.ndarray, np.ndarray, float]:
+    """
+    Process pool işçisi: bir haftalık CSV'yi okur ve kompakt forma çevirir
+    (term blob + offsets + int32 rank). Python dict'i süreçler arasında taşınmaz.
+    """
+    t0 = time.perf_counter()
+    ranks = _read_week_csv(path)
+    blob, offsets = encode_terms(list(ranks))
+    vals = np.fromiter(ranks.values(), dtype=np.int32, count=len(ranks))
+    return blob, offsets, vals, time.perf_counter() - t0
+
+
+def ingest_workers(workers: Optional[int] = None) -> int:
+    """Paralel ingest işçi sayısı: parametre > TREND_INGEST_WORKERS > CPU sayısı."""
+    if workers is None:
+        workers = int(os.environ.get("TREND_INGEST_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+    return max(1, workers)
+
+
+def _week_payloads(
+    files: List[Tuple[date, str]],
+    parse: Callable[[str], bool],
+    other: Callable[[str], Optional["WeekRanks"]],
+    workers: Optional[int] = None,
+    on_parsed: Optional[Callable[[str, List[str], np.ndarray], None]] = None,
+    stats: Optional[Dict] = None,
+) -> Iterator[Tuple[date, Optional["WeekRanks"]]]:
+    """
+    files sırasıyla (dt, payload) üretir. parse(path) True olan dosyalar
+    process pool'da paralel parse edilir; diğerleri için other(path) kullanılır.
+    Sonuçlar geldikçe (sırayı bozmadan) merge_weeks'e akar.
+    """
+    n = ingest_workers(workers)
+    todo = [p for _, p in files if parse(p)]
+    pool = ProcessPoolExecutor(max_workers=min(n, len(todo))) if n > 1 and len(todo) > 1 else None
+    futures = {p: pool.submit(_parse_week_file, p) for p in todo} if pool else {}
+    if stats is not None:
+        stats.update({"workers": n if pool else 1, "files": []})
+    try:
+        for dt, path in files:
+            if path not in todo:
+                yield dt, other(path)
+                continue
+            blob, offsets, vals, secs = futures[path].result() if pool else _parse_week_file(path)
+            terms = decode_terms(blob, offsets)
+            if on_parsed:
+                on_parsed(path, terms, vals)
+            name = os.path.basename(path)
+            print(f"⏱️ {name}: {len(terms)} terms parsed in {secs:.2f}s")
+            if stats is not None:
+                stats["files"].append({"file": name, "terms": len(terms), "seconds": round(secs, 4)})
+            yield dt, (terms, vals)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
 
 
 # ---------------------------------------------------------------------
 # Index İnşası
 # ---------------------------------------------------------------------
-def build_index(project_root: str) -> TrendIndex:
+def build_index(
+    project_root: str,
+    workers: Optional[int] = None,
+    stats: Optional[Dict] = None
+) -> TrendIndex:
     """
     project_root: .../amazon-trend-web (proje kökü)
     data/raw içindeki tüm CSV'leri okur, TrendIndex döner.
+    workers > 1 ise CSV'ler process pool'da paralel parse edilir (bkz. ingest_workers);
+    stats verilirse dosya başı ve toplam süreler içine yazılır.
     """
     raw_dir = os.path.join(project_root, "data", "raw")
     files = _list_week_files(raw_dir)
     if len(files) < 2:
         raise RuntimeError("En az 2 hafta CSV gerekli (data/raw/).")
 
-    idx = TrendIndex()
+    t0 = time.perf_counter()
+    idx = merge_weeks(TrendIndex(), _week_payloads(
+        files, parse=lambda p: True, other=lambda p: None, workers=workers, stats=stats,
+    ))
+    total = time.perf_counter() - t0
+    if stats is not None:
+        stats["total_seconds"] = round(total, 4)
+    print(f"⏱️ build_index: {len(files)} files in {total:.2f}s")
+    return idx
+
 
-    # Hafta listesi
-    for i, (dt, _) in enumerate(files, start=1):
+def merge_weeks(
+    idx: TrendIndex,
+    weeks: Iterable[Tuple[date, Optional[WeekRanks]]]
+) -> TrendIndex:
+    """
+    idx'i verilen hafta listesine (eski -> yeni) göre yeniden düzenler:
+      (dt, None)  -> idx'teki o tarihli satır aynen korunur
+      (dt, ranks) -> yeni / değişmiş hafta; satır ranks'tan üretilir
+                     (dict ya da kompakt (terms, int32 ranks) çifti)
+    Listede olmayan haftalar düşer, weekId'ler yeni sıraya göre yeniden atanır.
+    Streak'ler yalnızca ilk değişen haftadan itibaren yeniden hesaplanır.
+    idx yerinde güncellenir (sözlükleri olan, mmap'siz bir index olmalı).
+    """
+    old_rows = {dt: i for i, (_, dt) in enumerate(idx.weeks)}
+    old_terms = len(idx.terms)
+
+    # 1) Haftaları sıraya diz; yeni haftaları hemen (term_id, rank) dizilerine çevir
+    plan: List[Tuple[date, Optional[Tuple[np.ndarray, np.ndarray]]]] = []
+    for dt, ranks in weeks:
+        if ranks is None:
+            if dt not in old_rows:
+                raise ValueError(f"Week {dt.isoformat()} is not in the index.")
+            plan.append((dt, None))
+            continue
+        if isinstance(ranks, dict):
+            terms = list(ranks)
+            vals = np.fromiter(ranks.values(), dtype=np.int32, count=len(ranks))
+        else:
+            terms, vals = ranks
+        ids = np.empty(len(terms), dtype=np.int64)
+        for j, term in enumerate(terms):
+            tid = idx.term_ids.get(term)
+            if tid is None:
+                tid = len(idx.terms)
+                idx.term_ids[term] = tid
+                idx.terms.append(term)
+            ids[j] = tid
+        plan.append((dt, (ids, vals)))
+
+    # 2) Rank matrisi: korunan satırlar kopyalanır, yeniler dağıtılır
+    n_weeks, n_terms = len(plan), len(idx.terms)
+    ranks_m = np.full((n_weeks, n_terms), MISSING_RANK, dtype=np.int32)
+    first_changed = n_weeks
+    for row, (dt, cols) in enumerate(plan):
+        if cols is None:
+            old = old_rows[dt]
+            ranks_m[row, :old_terms] = idx.ranks[old]
+            if old != row:
+                first_changed = min(first_changed, row)
+        else:
+            ranks_m[row, cols[0]] = cols[1]
+            first_changed = min(first_changed, row)
+
+    # 3) Streak'ler: ilk değişen haftaya kadar aynen, sonrası artımlı
+    up = np.zeros((n_weeks, n_terms), dtype=np.uint16)
+    pres = np.zeros((n_weeks, n_terms), dtype=np.uint16)
+    up[:first_changed, :old_terms] = idx.up_streak[:first_changed]
+    pres[:first_changed, :old_terms] = idx.present_streak[:first_changed]
+    for w in range(first_changed, n_weeks):
+        if w == 0:
+            up[w], pres[w] = _streak_row(None, None, None, ranks_m[w])
+        else:
+            up[w], pres[w] = _streak_row(ranks_m[w - 1], up[w - 1], pres[w - 1], ranks_m[w])
+
+    idx.ranks, idx.up_streak, idx.present_streak = ranks_m, up, pres
+
+    # 4) Yeni term'ler için bayraklar ve token posting'leri
+    new_terms = idx.terms[old_terms:]
+    idx.flags = np.concatenate([
+        idx.flags,
+        np.fromiter((term_flags(t) for t in new_terms), dtype=np.uint8, count=len(new_terms)),
+    ])
+    _add_term_tokens(idx, old_terms)
+
+    # 5) weekId'ler
+    idx.weeks, idx.weekid_to_date, idx.week_labels = [], {}, {}
+    for i, (dt, _) in enumerate(plan, start=1):
         idx.weeks.append((i, dt))
         idx.weekid_to_date[i] = dt
         idx.week_labels[i] = f"Week {i} ({dt.isoformat()})"
 
-    # Ranks
-    for week_id, (_, path) in zip(range(1, len(files) + 1), files):
-        ranks = _read_week_csv(path)
-        for term, rank in ranks.items():
-            if term not in idx.term_ranks:
-                idx.term_ranks[term] = {}
-            idx.term_ranks[term][week_id] = rank
-
     return idx
 
 
+def _add_term_tokens(idx: TrendIndex, first_tid: int) -> None:
+    """
+    terms[first_tid:] için token posting list'lerini index'e katar.
+    Posting'ler (token_id, term_id) çiftlerinin stabil sıralamasıyla
+    CSR düzenine getirilir; her liste term_id'ye göre sıralı kalır.
+    """
+    tok_col: List[int] = []
+    tid_col: List[int] = []
+    for tid in range(first_tid, len(idx.terms)):
+        for tok in set(TOKEN_RE.findall(idx.terms[tid])):
+            k = idx.token_ids.get(tok)
+            if k is None:
+                k = len(idx.tokens)
+                idx.token_ids[tok] = k
+                idx.tokens.append(tok)
+            tok_col.append(k)
+            tid_col.append(tid)
+
+    # mevcut posting'leri (token_id, term_id) çiftlerine aç
+    counts = np.diff(idx.postings_offsets)
+    old_tok = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+    all_tok = np.concatenate([old_tok, np.asarray(tok_col, dtype=np.int32)])
+    all_tid = np.concatenate([idx.postings, np.asarray(tid_col, dtype=np.int32)])
+
+    order = np.argsort(all_tok, kind="stable")
+    idx.postings = all_tid[order]
+    idx.postings_offsets = np.zeros(len(idx.tokens) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(all_tok, minlength=len(idx.tokens)), out=idx.postings_offsets[1:])
+
+
+def _streak_row(
+    prev_rank: Optional[np.ndarray],
+    prev_up: Optional[np.ndarray],
+    prev_present: Optional[np.ndarray],
+    rank: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Bir önceki haftanın streak satırından bu haftanınkini üretir."""
+    present = rank != MISSING_RANK
+    if prev_rank is None:
+        row = present.astype(np.uint16)
+        return row, row.copy()
+    improved = present & (prev_rank != MISSING_RANK) & (prev_rank > rank)
+    up = np.where(improved, prev_up + 1, present).astype(np.uint16)
+    pres = np.where(present, prev_present + 1, 0).astype(np.uint16)
+    return up, pres
+
+
+def append_week_to_index(idx: TrendIndex, dt: date, week_ranks: Dict[str, int]) -> None:
+    """
+    Yeni (en güncel) haftayı index'e ekler; mevcut satırlar ve streak'ler
+    korunur, yalnızca yeni haftanın streak satırı hesaplanır.
+    """
+    if idx.weeks and dt <= idx.weeks[-1][1]:
+        raise ValueError(f"Week {dt.isoformat()} is not newer than the last indexed week.")
+    merge_weeks(idx, [(d, None) for _, d in idx.weeks] + [(dt, week_ranks)])
+
+
 # ---------------------------------------------------------------------
 # Yardımcılar (include/exclude)
 # ---------------------------------------------------------------------
@@ -205,53 +630,76 @@ def _word_hit(text: str, needle: str) -> bool:
     return re.search(pat, text.lower()) is not None
 
 
-def _passes_filters(term: str, include: Optional[str], exclude: Optional[str]) -> bool:
-    t = term.lower()
+def _filter_parts(s: Optional[str]) -> List[str]:
+    return [p.strip().lower() for p in (s or "").split(",") if p.strip()]
+
+
+def _match_ids(idx: TrendIndex, needle: str) -> np.ndarray:
+    """
+    _word_hit(term, needle) olan term_id'leri (sıralı) posting list'lerden bulur.
+    Needle'ın her \\w koşusu eşleşen term'de tam bir token'dır; bu yüzden
+    posting list kesişimi bir üst kümedir. Tek token'lı needle'da kesin sonuç,
+    ifade / noktalamalı needle'da yalnızca adaylar regex ile doğrulanır.
+    """
+    needle = needle.strip().lower()
+    toks = TOKEN_RE.findall(needle)
+    if not toks:
+        # token'sız needle (ör. "-"): eski tam tarama
+        return np.array([i for i, t in enumerate(idx.terms) if _word_hit(t, needle)], dtype=np.int32)
+
+    lists = sorted((idx.postings_for(t) for t in set(toks)), key=len)
+    cand = lists[0]
+    for other in lists[1:]:
+        if not len(cand):
+            break
+        cand = np.intersect1d(cand, other, assume_unique=True)
 
-    # EXCLUDE: listedeki herhangi bir kelime/ifadeyi kelime olarak içeriyorsa ELER
-    if exclude:
-        for part in [p.strip().lower() for p in exclude.split(",") if p.strip()]:
-            if _word_hit(t, part):
-                return False
+    if toks == [needle]:
+        return cand
+    return cand[[_word_hit(idx.terms[i], needle) for i in cand.tolist()]].astype(np.int32)
 
-    # INCLUDE: listedeki kelime/ifadelerden en az biri kelime olarak geçmeli
-    if include:
-        inc_parts = [p.strip().lower() for p in include.split(",") if p.strip()]
-        if inc_parts and not any(_word_hit(t, p) for p in inc_parts):
-            return False
 
-    return True
+def _union_ids(idx: TrendIndex, parts: List[str]) -> np.ndarray:
+    if not parts:
+        return np.zeros(0, dtype=np.int32)
+    return np.unique(np.concatenate([_match_ids(idx, p) for p in parts]))
 
 
 # ---------------------------------------------------------------------
 # Trend Mantığı
 # ---------------------------------------------------------------------
-def _strict_uptrend_for_range(
-    ranks_by_weekid: Dict[int, int],
-    start_id: int,
-    end_id: int
-) -> Optional[Tuple[int, int, int]]:
+def term_flags(term: str) -> int:
+    """🧹 Bozuk / anlamsız term bayrakları (TERM_*); 0 = temiz."""
+    t = (term or "").strip(" ")
+    flags = 0
+    if len(t) < 2:
+        flags |= TERM_SHORT
+    if t.lower() == t.upper():
+        flags |= TERM_UNCASED
+    if t.startswith("#"):
+        flags |= TERM_FORMULA
+    if _NUMERIC_RE.fullmatch(t):
+        flags |= TERM_NUMERIC
+    if not _LETTER_RE.search(t):
+        flags |= TERM_NO_LETTERS
+    return flags
+
+
+def _top_k(tids: np.ndarray, total_impr: np.ndarray, end_rank: np.ndarray, limit: int) -> np.ndarray:
     """
-    Seçilen [start_id..end_id] aralığında:
-      - Her hafta mevcut
-      - Her adımda prev_rank > curr_rank  (STRICT)
-    True ise (start_rank, end_rank, total_improvement) döndürür; aksi halde None.
+    Sıralama: önce total_improvement DESC, sonra end_rank ASC; eşitlikte
+    term_id (eski dict sırası). Tüm adaylar yerine yalnızca ilk `limit`
+    sıralanır: np.partition ile limit'inci en büyük iyileşme eşiği bulunur,
+    sadece eşiği geçenler (eşitlikler dahil) lexsort'a girer.
     """
-    last_rank: Optional[int] = None
-    start_rank: Optional[int] = None
-    for w in range(start_id, end_id + 1):
-        if w not in ranks_by_weekid:
-            return None
-        r = ranks_by_weekid[w]
-        if last_rank is None:
-            start_rank = r
-        else:
-            if not (last_rank > r):
-                return None
-        last_rank = r
-    end_rank = last_rank if last_rank is not None else None
-    total_impr = (start_rank - end_rank) if (start_rank is not None and end_rank is not None) else 0
-    return (start_rank, end_rank, total_impr)  # type: ignore
+    n = len(tids)
+    if 0 < limit < n:
+        impr = total_impr[tids]
+        threshold = np.partition(impr, n - limit)[n - limit]
+        tids = tids[impr >= threshold]
+    # lexsort stabil: tids artan sırada olduğundan eşitlikte term_id korunur
+    order = np.lexsort((end_rank[tids], -total_impr[tids]))
+    return tids[order][:limit]
 
 
 def query_uptrends(
@@ -266,43 +714,42 @@ def query_uptrends(
         start_week_id, end_week_id = end_week_id, start_week_id
     if end_week_id - start_week_id + 1 < 2:
         return []
+    # Index dışında kalan hafta varsa hiçbir term "her hafta mevcut" olamaz
+    if start_week_id < 1 or end_week_id > idx.n_weeks:
+        return []
 
-    results: List[Dict] = []
-    for term, weeks_map in idx.term_ranks.items():
-        # 🧹 Bozuk / anlamsız terimleri filtrele
-        if not term:
-            continue
-        t = term.strip().lower()
-
-        # Excel/formül hataları (#NAME?, #REF!, vs.)
-        if t.startswith("#"):
-            continue
-        # Tamamen sayısal ya da bilimsel format (9.78E+12, 1.23e-5, 12345, +10, -3.2)
-        if re.fullmatch(r"[0-9.eE+\-]+", t):
-            continue
-        # Çok kısa ya da hiç harf içermeyen şeyleri at
-        if len(t) < 2 or not re.search(r"[a-zA-Z]", t):
-            continue
-
-        if not _passes_filters(term, include, exclude):
-            continue
-
-        check = _strict_uptrend_for_range(weeks_map, start_week_id, end_week_id)
-        if check is None:
-            continue
-
-        start_rank, end_rank, total_impr = check
-        results.append({
-            "term": term,
-            "start_rank": start_rank,
-            "end_rank": end_rank,
-            "total_improvement": total_impr,
-            "weeks": end_week_id - start_week_id + 1
-        })
-
-    # sıralama: önce total_improvement DESC, sonra end_rank ASC
-    results.sort(key=lambda r: (-r["total_improvement"], r["end_rank"]))
-    return results[:limit]
+    # Streak index: [s..e] aralığı tek karşılaştırma
+    weeks = end_week_id - start_week_id + 1
+    end_streak = idx.up_streak[end_week_id - 1]
+    start_rank = idx.ranks[start_week_id - 1]
+    end_rank = idx.ranks[end_week_id - 1]
+    total_impr = start_rank.astype(np.int64) - end_rank
+
+    # INCLUDE: listedeki kelime/ifadelerden en az biri -> posting list birleşimi
+    inc_parts = _filter_parts(include)
+    if inc_parts:
+        cand = _union_ids(idx, inc_parts)
+        tids = cand[(end_streak[cand] >= weeks) & ((idx.flags[cand] & JUNK_MASK) == 0)]
+    else:
+        tids = np.flatnonzero((end_streak >= weeks) & ((idx.flags & JUNK_MASK) == 0))
+
+    # EXCLUDE: herhangi birini içeren ELENİR -> küme farkı
+    exc_parts = _filter_parts(exclude)
+    if exc_parts and len(tids):
+        tids = np.setdiff1d(tids, _union_ids(idx, exc_parts), assume_unique=True)
+
+    tids = _top_k(tids, total_impr, end_rank, limit)
+
+    return [
+        {
+            "term": idx.terms[t],
+            "start_rank": int(start_rank[t]),
+            "end_rank": int(end_rank[t]),
+            "total_improvement": int(total_impr[t]),
+            "weeks": weeks
+        }
+        for t in tids.tolist()
+    ]
 
 
 def query_series(
@@ -314,11 +761,16 @@ def query_series(
     if start_week_id > end_week_id:
         start_week_id, end_week_id = end_week_id, start_week_id
     series: List[Dict] = []
-    ranks_map = idx.term_ranks.get(term.lower(), {})
+    tid = idx.term_id(term.lower())
     for w in range(start_week_id, end_week_id + 1):
+        rank = None  # None olabilir (UI göstermek için)
+        if tid is not None and 1 <= w <= idx.n_weeks:
+            r = int(idx.ranks[w - 1, tid])
+            if r != MISSING_RANK:
+                rank = r
         series.append({
             "weekId": w,
             "weekLabel": idx.week_labels.get(w, f"Week {w}"),
-            "rank": ranks_map.get(w)  # None olabilir (UI göstermek için)
+            "rank": rank
         })
     return series
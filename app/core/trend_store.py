@@ -0,0 +1,237 @@
+"""
+trend_store.py — TrendIndex için mmap'lenebilir ikili dosya formatı.
+
+Dosya düzeni (little-endian):
+  [0:8)    MAGIC
+  [8:12)   uint32 format versiyonu (= trend_core.INDEX_VERSION)
+  [12:16)  uint32 header uzunluğu
+  [16:..)  JSON header: hafta tarihleri + her bölümün (offset, dtype, shape) bilgisi
+  ...      64 byte hizalı bölümler: term string tablosu (blob + offsets + sıralama),
+           rank matrisi, streak'ler, token tablosu ve posting list'ler.
+
+open_index() dosyayı mmap ile açar ve bölümleri np.frombuffer ile kopyasız
+gösterir; tüm worker'lar aynı page-cache sayfalarını paylaşır.
+
+Artımlı güncelleme için her haftalık CSV ayrıca bir "segment" dosyasına
+(term blob + offsets + rank) yazılır; CSV değişmedikçe yeniden parse edilmez.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import mmap
+import os
+import struct
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.trend_core import INDEX_VERSION, TrendIndex, decode_terms, encode_terms
+
+MAGIC = b"UTRIDX\x00\x00"
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 64
+
+
+# ---------------------------------------------------------------------
+# String tablosu (term / token sözlükleri)
+# ---------------------------------------------------------------------
+class StringTable:
+    """
+    id -> string (utf-8 blob + offsets) ve string -> id (sıralı id dizisinde
+    ikili arama). list gibi indekslenir / iterate edilir.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, order: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _bytes(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self._bytes(int(i)).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self) -> List[str]:
+        """Tüm tabloyu tek seferde decode eder (satır satır slicing'den hızlı)."""
+        return decode_terms(self.blob.tobytes(), self.offsets)
+
+    def find(self, s: str) -> Optional[int]:
+        key = s.encode("utf-8")
+        keys = _SortedKeys(self)
+        pos = bisect.bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            return int(self.order[pos])
+        return None
+
+
+class _SortedKeys(Sequence):
+    """bisect için: sıralı pozisyondaki string'in byte'ları."""
+
+    def __init__(self, table: StringTable):
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table.order)
+
+    def __getitem__(self, pos):
+        return self.table._bytes(int(self.table.order[pos]))
+
+
+def _encode_strings(strings: Sequence[str]):
+    blob, offsets = encode_terms(strings)
+    keys = [blob[offsets[i]:offsets[i + 1]] for i in range(len(strings))]
+    order = np.array(sorted(range(len(keys)), key=keys.__getitem__), dtype=np.int32)
+    return np.frombuffer(blob, dtype=np.uint8), offsets, order
+
+
+# ---------------------------------------------------------------------
+# Yazma
+# ---------------------------------------------------------------------
+def save_index(idx: TrendIndex, path: Path) -> None:
+    """Index'i ikili formatta yazar (önce .tmp, sonra atomik rename)."""
+    term_blob, term_offsets, term_order = _encode_strings(idx.terms)
+    tok_blob, tok_offsets, tok_order = _encode_strings(idx.tokens)
+
+    sections: Dict[str, np.ndarray] = {
+        "term_blob": term_blob,
+        "term_offsets": term_offsets,
+        "term_order": term_order,
+        "ranks": np.ascontiguousarray(idx.ranks, dtype=np.int32),
+        "flags": np.ascontiguousarray(idx.flags, dtype=np.uint8),
+        "up_streak": np.ascontiguousarray(idx.up_streak, dtype=np.uint16),
+        "present_streak": np.ascontiguousarray(idx.present_streak, dtype=np.uint16),
+        "token_blob": tok_blob,
+        "token_offsets": tok_offsets,
+        "token_order": tok_order,
+        "postings_offsets": np.ascontiguousarray(idx.postings_offsets, dtype=np.int64),
+        "postings": np.ascontiguousarray(idx.postings, dtype=np.int32),
+    }
+
+    layout: Dict[str, Dict] = {
+        name: {"offset": 0, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        for name, arr in sections.items()
+    }
+    header = {
+        "week_dates": [dt.isoformat() for _, dt in idx.weeks],
+        "sections": layout,
+    }
+    # Offset'ler header uzunluğuna, header da offset'lere bağlı: sabitlenene kadar tekrarla
+    header_bytes = json.dumps(header).encode("utf-8")
+    while True:
+        pos = _align(_PREFIX.size + len(header_bytes))
+        for name, arr in sections.items():
+            layout[name]["offset"] = pos
+            pos = _align(pos + arr.nbytes)
+        encoded = json.dumps(header).encode("utf-8")
+        if len(encoded) <= len(header_bytes):
+            header_bytes = encoded.ljust(len(header_bytes))
+            break
+        header_bytes = encoded
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, INDEX_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in sections.items():
+            f.seek(layout[name]["offset"])
+            arr.tofile(f)
+        f.truncate(pos)
+    os.replace(tmp, path)
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# ---------------------------------------------------------------------
+# Okuma (mmap, kopyasız)
+# ---------------------------------------------------------------------
+def open_index(path: Path) -> TrendIndex:
+    """Dosyayı mmap ile açar; diziler dosyaya bakan salt-okunur view'lardır."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_len = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path.name}: not a trend index file")
+    if version != INDEX_VERSION:
+        raise ValueError(f"{path.name}: index version {version}, expected {INDEX_VERSION}")
+    header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+
+    arrays: Dict[str, np.ndarray] = {}
+    for name, sec in header["sections"].items():
+        dtype = np.dtype(sec["dtype"])
+        shape = tuple(sec["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        if count == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+            continue
+        arrays[name] = np.frombuffer(mm, dtype=dtype, count=count, offset=sec["offset"]).reshape(shape)
+
+    idx = TrendIndex()
+    dates: List[date] = [date.fromisoformat(d) for d in header["week_dates"]]
+    for i, dt in enumerate(dates, start=1):
+        idx.weeks.append((i, dt))
+        idx.weekid_to_date[i] = dt
+        idx.week_labels[i] = f"Week {i} ({dt.isoformat()})"
+
+    idx.terms = StringTable(arrays["term_blob"], arrays["term_offsets"], arrays["term_order"])
+    idx.term_ids = None
+    idx.ranks = arrays["ranks"]
+    idx.flags = arrays["flags"]
+    idx.up_streak = arrays["up_streak"]
+    idx.present_streak = arrays["present_streak"]
+    idx.tokens = StringTable(arrays["token_blob"], arrays["token_offsets"], arrays["token_order"])
+    idx.token_ids = None
+    idx.postings_offsets = arrays["postings_offsets"]
+    idx.postings = arrays["postings"]
+    # view'lar yaşadıkça mmap açık kalmalı
+    idx._mmap = mm
+    return idx
+
+
+def thaw_index(idx: TrendIndex) -> TrendIndex:
+    """mmap'li (salt-okunur) index'in değiştirilebilir, bellekteki kopyası."""
+    out = TrendIndex()
+    out.weeks = list(idx.weeks)
+    out.weekid_to_date = dict(idx.weekid_to_date)
+    out.week_labels = dict(idx.week_labels)
+    out.terms = idx.terms.to_list() if isinstance(idx.terms, StringTable) else list(idx.terms)
+    out.term_ids = {t: i for i, t in enumerate(out.terms)}
+    out.tokens = idx.tokens.to_list() if isinstance(idx.tokens, StringTable) else list(idx.tokens)
+    out.token_ids = {t: i for i, t in enumerate(out.tokens)}
+    out.ranks = np.array(idx.ranks)
+    out.flags = np.array(idx.flags)
+    out.up_streak = np.array(idx.up_streak)
+    out.present_streak = np.array(idx.present_streak)
+    out.postings_offsets = np.array(idx.postings_offsets)
+    out.postings = np.array(idx.postings)
+    return out
+
+
+# ---------------------------------------------------------------------
+# Haftalık segmentler (parse edilmiş CSV)
+# ---------------------------------------------------------------------
+def save_segment(path: Path, terms: List[str], ranks: np.ndarray) -> None:
+    blob, offsets = encode_terms(terms)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, term_blob=np.frombuffer(blob, dtype=np.uint8), term_offsets=offsets, ranks=ranks)
+    os.replace(tmp, path)
+
+
+def load_segment(path: Path) -> Tuple[List[str], np.ndarray]:
+    with np.load(path) as z:
+        return decode_terms(z["term_blob"].tobytes(), z["term_offsets"]), z["ranks"]
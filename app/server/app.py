@@ -1,6 +1,7 @@
 # app/server/app.py
-from flask import Flask, jsonify, request, render_template, session, redirect, url_for
-import logging, os
+from flask import Flask, g, jsonify, request, render_template, session, redirect, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+import json, logging, os
 from pathlib import Path
 from app.core.payments import create_checkout
 # --- DIAGNOSTIC ENDPOINT ---
@@ -15,7 +16,6 @@ from app.server.emailing import (
 from app.core.auth import set_plan
 from flask import Response  # en üste importlara ekle
 
-from app.core.db import get_conn, init_full, append_week
 from app.core.auth import (
     ensure_users_table,
     create_user,
@@ -27,7 +27,11 @@ from app.core.auth import (
     set_password_for_email,
 )
 
-from app.core.db import get_conn, init_full, append_week, ensure_subscribers_table
+from app.core.db import get_conn, writer, init_full, append_week, sync_raw, ensure_subscribers_table
+from app.core.jobs import runner as reindex_jobs
+from app.core.result_cache import cache as result_cache
+from app.core.single_flight import flights as query_flights
+from app.core.db import ensure_trend_schema, dataset_conn, current_version, fetch_weeks, fetch_uptrends, fetch_series, fetch_diag, iter_uptrends
 
 
 
@@ -75,6 +79,8 @@ app.logger.setLevel(logging.INFO)
 
 # users tablosu hazır olsun
 ensure_users_table()
+# weeks / terms / ranks şeması (eski searches tablosu varsa taşınır)
+ensure_trend_schema()
 
 # ---------- Health & Landing ----------
 @app.get("/health")
@@ -278,15 +284,12 @@ def subscribe():
     # tabloyu garantiye al
     ensure_subscribers_table()
 
-    con = get_conn(read_only=False)
-    try:
+    with writer() as con:
         con.execute(
             "INSERT OR IGNORE INTO subscribers(email) VALUES (?)",
             [email],
         )
         con.commit()
-    finally:
-        con.close()
 
     # Şimdilik tekrar landing'e dön
     return redirect(url_for("landing"))
@@ -397,24 +400,17 @@ def admin_dashboard():
 @app.get("/weeks")
 def weeks():
     try:
-        con = get_conn(read_only=True)
-        rows = con.execute("""
-            WITH all_weeks AS (
-              SELECT DISTINCT week FROM searches ORDER BY week
-            )
-            SELECT
-              ROW_NUMBER() OVER (ORDER BY week)   AS week_id,
-              week                                 AS label
-            FROM all_weeks
-        """).fetchall()
-        con.close()
-        return jsonify([{"weekId": int(r[0]), "label": r[1]} for r in rows])
+        return _cached_json("weeks", {}, lambda con: [
+            {"weekId": int(r[0]), "label": r[1]} for r in fetch_weeks(con)
+        ])
     except Exception as e:
         app.logger.error("weeks failed: %s", e)
         return jsonify([])
 
 
 # ---------- API: Reindex ----------
+# İş arka planda (app.core.jobs) çalışır; istek hemen job id ile döner.
+# Aynı iş zaten kuyrukta / çalışıyorsa yeni iş açılmaz, o iş döner.
 @app.get("/reindex")
 def reindex():
     try:
@@ -427,163 +423,314 @@ def reindex():
             shutil.rmtree(store, ignore_errors=True)
 
         if mode == "full":
-            init_full(PROJECT_ROOT)
-            return jsonify({"status": "ok", "mode": "full"})
-
-        week = request.args.get("week")
-        if not week:
-            return jsonify({"error": "week required for append"}), 400
-        csv_path = PROJECT_ROOT / "data" / "raw" / f"{week}.csv"
-        if not csv_path.exists():
-            return jsonify({"error": f"csv not found: {csv_path.name}"}), 404
-        append_week(csv_path.as_posix(), week)
-        return jsonify({"status": "ok", "mode": "append", "week": week})
+            job, created = reindex_jobs.submit(
+                "full", "full", lambda job: init_full(PROJECT_ROOT, progress=job.update), mode="full")
+        elif mode == "sync":
+            # sadece yeni / içeriği değişen CSV'ler (ingest manifest)
+            job, created = reindex_jobs.submit(
+                "sync", "sync", lambda job: sync_raw(PROJECT_ROOT, progress=job.update), mode="sync")
+        else:
+            week = request.args.get("week")
+            if not week:
+                return jsonify({"error": "week required for append"}), 400
+            csv_path = PROJECT_ROOT / "data" / "raw" / f"{week}.csv"
+            if not csv_path.exists():
+                return jsonify({"error": f"csv not found: {csv_path.name}"}), 404
+            job, created = reindex_jobs.submit(
+                "append", f"append:{week}",
+                lambda job: append_week(csv_path.as_posix(), week, progress=job.update),
+                mode="append", week=week)
+
+        body = job.to_dict()
+        body["created"] = created
+        body["status_url"] = url_for("reindex_status", job_id=job.id)
+        return jsonify(body), 202
     except Exception as e:
         app.logger.exception("reindex failed")
         return jsonify({"error": "reindex_failed", "message": str(e)}), 500
 
+
+@app.get("/reindex/status")
+@app.get("/reindex/status/<job_id>")
+def reindex_status(job_id=None):
+    """İşin durumu: faz, dosya ilerlemesi, satır sayısı, satır/sn, hata. id yoksa son işler."""
+    if job_id is None:
+        return jsonify([j.to_dict() for j in reindex_jobs.recent()])
+    job = reindex_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found", "job_id": job_id}), 404
+    return jsonify(job.to_dict())
+
+# ---------- API: Sonuç önbelleği + ETag ----------
+# /weeks, /uptrends ve /series: anahtar = veri seti sürümü + normalize
+# parametreler (plan sınırları uygulandıktan sonraki değerler). Yeni sürüm
+# yayınlanınca anahtarlar kendiliğinden değişir. Aynı anahtar strong ETag
+# olarak döner; If-None-Match tutarsa DB'ye hiç gidilmeden 304.
+# Yanıt oturuma (plan) bağlı: private + her seferinde doğrulama (no-cache).
+API_CACHE_CONTROL = "private, no-cache"
+def _norm_filter(s: str) -> str:
+    """include/exclude: virgül/boşluk ayrımı, sıra ve tekrar sonucu değiştirmez."""
+    import re
+    return " ".join(sorted({p for p in re.split(r"[,\s]+", s or "") if p}))
+
+
+def _cached_json(kind: str, params: dict, fetch):
+    """
+    fetch(con) -> JSON'a çevrilecek değer; önbellekte varsa DB'ye gidilmez.
+    Önbellekte yoksa aynı anahtarla eşzamanlı gelen istekler tek sorguyu paylaşır.
+    """
+    version = current_version()
+    if version and request.if_none_match:
+        key = result_cache.key(kind, version, params)
+        if request.if_none_match.contains_weak(key):
+            return _cache_headers(Response(status=304), key)
+
+    con = dataset_conn()
+    g.dataset_version = con.version
+    try:
+        key = result_cache.key(kind, con.version, params)
+        body = result_cache.get(key, con.version)
+        if body is None:
+            def run():
+                out = app.json.dumps(fetch(con)).encode("utf-8")
+                result_cache.put(key, con.version, out)
+                return out
+            body, _ = query_flights.do(key, run)
+    finally:
+        con.close()
+    return _cache_headers(Response(body, mimetype="application/json"), key)
+
+
+def _cache_headers(resp, key: str):
+    resp.set_etag(key)
+    resp.headers["Cache-Control"] = API_CACHE_CONTROL
+    resp.vary.add("Cookie")
+    return resp
+
+
+# ---------- Keyset sayfalama (Pro /uptrends) ----------
+# cursor = son satırın (total_improvement, end_rank, term) değeri + veri seti
+# sürümü + sorgu parmak izi; app.secret_key ile imzalı, istemci için opak.
+# Sonraki sayfa OFFSET ile baştan sıralanmaz, bu satırdan devam eder
+# (materyalize pencerede pos sırası, diğerlerinde WHERE + top-N).
+# Sonraki sayfanın cursor'ı X-Next-Cursor başlığında döner.
+def _cursor_signer():
+    return URLSafeSerializer(app.secret_key, salt="uptrends-cursor")
+
+
+def _cursor_query(params: dict) -> str:
+    """Cursor'ın ait olduğu sorgu: sayfa parametreleri hariç."""
+    q = {k: v for k, v in params.items() if k not in ("limit", "offset", "after")}
+    return result_cache.key("uptrends-cursor", "", q)
+
+
+def _encode_cursor(version: str, params: dict, row: dict) -> str:
+    return _cursor_signer().dumps({
+        "v": version, "q": _cursor_query(params),
+        "k": [row["total_improvement"], row["end_rank"], row["term"]],
+    })
+
+
+def _decode_cursor(token: str, params: dict):
+    """(after, hata yanıtı): hata varsa after None."""
+    try:
+        data = _cursor_signer().loads(token)
+        after = tuple(data["k"])
+        ok = data["q"] == _cursor_query(params) and len(after) == 3
+    except (BadSignature, KeyError, TypeError, ValueError):
+        ok = False
+    if not ok:
+        return None, (jsonify({"error": "invalid_cursor"}), 400)
+    if data["v"] != current_version():
+        # yeni veri yayınlandı: sıralama değişmiş olabilir, ilk sayfadan başlanmalı
+        return None, (jsonify({"error": "cursor_expired", "message": "Data was updated; reload from the first page."}), 410)
+    return after, None
+
+
 # ---------- API: Uptrends ----------
+def _uptrends_request(max_limit: int):
+    """
+    /uptrends ve /uptrends/export ortak parametreleri, plan sınırlarıyla.
+    Dönen: (mode, params) ya da (None, hata yanıtı)
+    """
+    start_id = request.args.get("startWeekId", type=int)
+    end_id   = request.args.get("endWeekId", type=int)
+    include  = (request.args.get("include") or "").strip().lower()
+    exclude  = (request.args.get("exclude") or "").strip().lower()
+    limit    = request.args.get("limit", 250, type=int)
+    offset   = request.args.get("offset", 0, type=int)
+    max_rank = request.args.get("maxRank", 1_500_000, type=int)
+    strict   = (request.args.get("strict") or "").lower() in ("1", "true", "yes")
+
+    # ✅ MODE sadece session+plan ile belirlenir (URL/cookie ASLA değil)
+    email = session.get("user_email")
+    mode = "demo"
+    if email:
+        u = get_user(email)
+        if u and u.get("plan") == "pro":
+            mode = "pro"
+
+    if not (start_id and end_id):
+        return None, (jsonify({"error": "Provide startWeekId and endWeekId"}), 400)
+    if end_id < start_id:
+        start_id, end_id = end_id, start_id
+
+    # ✅ DEMO için 6 hafta clamp (ve pagination bypass kapalı)
+    if mode == "demo":
+        if (end_id - start_id + 1) > 6:
+            end_id = start_id + 5  # 6 hafta
+        limit = min(limit, 50)
+        offset = 0
+    else:
+        limit = min(limit, max_limit)
+        offset = max(offset, 0)
+
+    return mode, {
+        "start": start_id, "end": end_id,
+        "include": _norm_filter(include), "exclude": _norm_filter(exclude),
+        "maxRank": max_rank, "limit": limit, "offset": offset, "strict": strict,
+    }
+
+
 @app.get("/uptrends")
 def uptrends():
     try:
-        import re
+        mode, params = _uptrends_request(max_limit=250)
+        if mode is None:
+            return params
+        start_id, end_id = params["start"], params["end"]
+        include, exclude = params["include"], params["exclude"]
+        max_rank, limit, offset, strict = params["maxRank"], params["limit"], params["offset"], params["strict"]
+
+        # ✅ cursor sadece Pro (demo'da sayfalama yok)
+        after = None
+        cursor = request.args.get("cursor")
+        if cursor and mode == "pro":
+            after, error = _decode_cursor(cursor, params)
+            if error:
+                return error
+            params["offset"] = offset = 0
+            params["after"] = list(after)
+
+        def fetch(con):
+            rows = fetch_uptrends(con, start_id, end_id, include, exclude,
+                                  max_rank, limit, offset, strict=strict, after=after)
+            return [
+                {
+                    "term": r[0],
+                    "start_rank": int(r[1]) if r[1] is not None else None,
+                    "end_rank":   int(r[2]) if r[2] is not None else None,
+                    "total_improvement": int(r[3]) if r[3] is not None else None,
+                    "weeks": int(r[4]) if r[4] is not None else None,
+                } for r in rows
+            ]
+
+        resp = _cached_json("uptrends", params, fetch)
+        if mode == "pro" and resp.status_code == 200:
+            rows = json.loads(resp.get_data())
+            if limit and len(rows) == limit:
+                resp.headers["X-Next-Cursor"] = _encode_cursor(g.dataset_version, params, rows[-1])
+        return resp
 
-        start_id = request.args.get("startWeekId", type=int)
-        end_id   = request.args.get("endWeekId", type=int)
-        include  = (request.args.get("include") or "").strip().lower()
-        exclude  = (request.args.get("exclude") or "").strip().lower()
-        limit    = request.args.get("limit", 250, type=int)
-        offset   = request.args.get("offset", 0, type=int)
-        max_rank = request.args.get("maxRank", 1_500_000, type=int)
+    except Exception as e:
+        app.logger.exception("uptrends failed")
+        return jsonify({"error": "uptrends_failed", "message": str(e)}), 500
 
-        # ✅ MODE sadece session+plan ile belirlenir (URL/cookie ASLA değil)
-        email = session.get("user_email")
-        mode = "demo"
-        if email:
-            u = get_user(email)
-            if u and u.get("plan") == "pro":
-                mode = "pro"
+# ---------- API: Uptrends export (CSV / XLSX) ----------
+# /uptrends ile aynı filtre ve plan sınırları; Pro'da sayfa sınırı yerine
+# EXPORT_MAX_ROWS. Satırlar DuckDB cursor'ından batch batch yazılır (sonuç
+# Python'da tutulmaz). CSV doğrudan akar; XLSX xlsxwriter constant_memory
+# ile geçici dosyaya yazılıp parça parça gönderilir.
+# weekly=1: penceredeki her hafta için rank kolonu (/series gibi).
+EXPORT_MAX_ROWS = int(os.environ.get("EXPORT_MAX_ROWS", "100000"))
+EXPORT_CHUNK = 64 * 1024
 
-        if not (start_id and end_id):
-            return jsonify({"error": "Provide startWeekId and endWeekId"}), 400
-        if end_id < start_id:
-            start_id, end_id = end_id, start_id
 
-        # ✅ DEMO için 6 hafta clamp (ve pagination bypass kapalı)
-        if mode == "demo":
-            if (end_id - start_id + 1) > 6:
-                end_id = start_id + 5  # 6 hafta
-            limit = min(limit, 50)
-            offset = 0
-        else:
-            limit = min(limit, 250)
-            offset = max(offset, 0)
-
-        con = get_conn(read_only=True)
-        try:
-            tmp_root = os.environ.get("DATA_DIR", "/app/storage")
-            os.makedirs(os.path.join(tmp_root, "tmp"), exist_ok=True)
-            con.execute(f"SET temp_directory='{os.path.join(tmp_root, 'tmp')}';")
-            con.execute("SET max_temp_directory_size='10GB';")
-            con.execute("SET memory_limit='2GB';")
-            con.execute("SET threads=2;")
-            con.execute("SET preserve_insertion_order=false;")
-        except Exception:
-            pass
-
-        sql = """
-        WITH all_weeks AS (
-          SELECT DISTINCT week FROM searches ORDER BY week
-        ),
-        weeks_idx AS (
-          SELECT week, ROW_NUMBER() OVER (ORDER BY week) AS week_id
-          FROM all_weeks
-        ),
-        filtered AS (
-          SELECT s.term, s.rank, w.week_id
-          FROM searches s
-          JOIN weeks_idx w USING(week)
-          WHERE w.week_id BETWEEN ? AND ?
-            AND s.rank IS NOT NULL
-            AND s.rank <= ?
-            AND LENGTH(TRIM(s.term)) >= 2
-            AND LOWER(s.term) <> UPPER(s.term)
-        ),
-        filt2 AS (
-          SELECT * FROM filtered WHERE 1=1
-        """
-        params = [start_id, end_id, max_rank]
-
-        # include/exclude stringlerini parçala
-        def _parts_space(s: str):
-            parts = re.split(r"[,\s]+", s or "")
-            return [p.strip().lower() for p in parts if p.strip()]
-
-        # ✅ INCLUDE: kelime bazlı eşleşme (trumpet sorunu çözülüyor)
-        if include:
-            for w in _parts_space(include):
-                pattern = rf"(^|[^a-z]){re.escape(w)}([^a-z]|$)"
-                sql += " AND REGEXP_MATCHES(LOWER(term), ?)"
-                params.append(pattern)
-
-        # ✅ EXCLUDE: aynı mantıkla hariç tut
-        if exclude:
-            for w in _parts_space(exclude):
-                pattern = rf"(^|[^a-z]){re.escape(w)}([^a-z]|$)"
-                sql += " AND NOT REGEXP_MATCHES(LOWER(term), ?)"
-                params.append(pattern)
-
-        sql += """
-        ),
-        term_bounds AS (
-          SELECT term,
-                 MIN(week_id) AS min_w,
-                 MAX(week_id) AS max_w,
-                 COUNT(*)     AS cnt
-          FROM filt2
-          GROUP BY term
-          HAVING COUNT(*) >= 2
-        ),
-        start_end AS (
-          SELECT f.term,
-                 MAX(CASE WHEN f.week_id = tb.min_w THEN f.rank END) AS start_rank,
-                 MAX(CASE WHEN f.week_id = tb.max_w THEN f.rank END) AS end_rank,
-                 tb.cnt AS weeks
-          FROM filt2 f
-          JOIN term_bounds tb USING(term)
-          GROUP BY f.term, tb.cnt
+@app.get("/uptrends/export")
+def uptrends_export():
+    con = None
+    try:
+        # sayısal parametreler sessizce varsayılana düşmesin (limit=-1 vb.)
+        for name in ("limit", "maxRank"):
+            raw = request.args.get(name)
+            if raw is not None and not (raw.isdigit() and int(raw) >= 1):
+                return jsonify({"error": f"{name} must be a positive integer"}), 400
+
+        mode, params = _uptrends_request(max_limit=EXPORT_MAX_ROWS)
+        if mode is None:
+            return params
+        fmt = (request.args.get("format") or "csv").lower()
+        if fmt not in ("csv", "xlsx"):
+            return jsonify({"error": "format must be csv or xlsx"}), 400
+        if mode == "pro" and "limit" not in request.args:
+            params["limit"] = EXPORT_MAX_ROWS
+        weekly = (request.args.get("weekly") or "").lower() in ("1", "true", "yes")
+        start_id, end_id = params["start"], params["end"]
+
+        con = dataset_conn()
+        labels = {int(w): label for w, label in fetch_weeks(con)}
+        header = ["term", "start_rank", "end_rank", "total_improvement", "weeks"]
+        if weekly:
+            header += [labels.get(w, f"week {w}") for w in range(start_id, end_id + 1)]
+        batches = iter_uptrends(con, start_id, end_id, params["include"], params["exclude"],
+                                params["maxRank"], params["limit"], strict=params["strict"], weekly=weekly)
+        write = _export_xlsx if fmt == "xlsx" else _export_csv
+        filename = f"uptrends_{start_id}-{end_id}.{fmt}"
+        mimetype = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    if fmt == "xlsx" else "text/csv")
+        return Response(
+            write(con, header, batches), mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                     "Cache-Control": "private, no-store"},
         )
-        SELECT se.term,
-               se.start_rank::BIGINT,
-               se.end_rank::BIGINT,
-               (se.start_rank - se.end_rank)::BIGINT AS total_improvement,
-               se.weeks::BIGINT
-        FROM start_end se
-        WHERE se.start_rank IS NOT NULL
-          AND se.end_rank   IS NOT NULL
-          AND se.start_rank > se.end_rank
-        ORDER BY total_improvement DESC, se.end_rank ASC
-        LIMIT ? OFFSET ?;
-        """
-
-        params.extend([limit, offset])
-
-        rows = con.execute(sql, params).fetchall()
+    except Exception as e:
+        # yanıt oluşmadan düştüysek cursor'ı generator kapatmaz
+        if con is not None:
+            con.close()
+        app.logger.exception("export failed")
+        return jsonify({"error": "export_failed", "message": str(e)}), 500
+
+
+def _export_csv(con, header, batches):
+    import csv, io
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    try:
+        w.writerow(header)
+        for rows in batches:
+            w.writerows(rows)
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode("utf-8")
+    finally:
         con.close()
 
-        return jsonify([
-            {
-                "term": r[0],
-                "start_rank": int(r[1]) if r[1] is not None else None,
-                "end_rank":   int(r[2]) if r[2] is not None else None,
-                "total_improvement": int(r[3]) if r[3] is not None else None,
-                "weeks": int(r[4]) if r[4] is not None else None,
-            } for r in rows
-        ])
 
-    except Exception as e:
-        app.logger.exception("uptrends failed")
-        return jsonify({"error": "uptrends_failed", "message": str(e)}), 500
+def _export_xlsx(con, header, batches):
+    import tempfile
+    import xlsxwriter
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+        ws = wb.add_worksheet("uptrends")
+        ws.write_row(0, 0, header, wb.add_format({"bold": True}))
+        ws.freeze_panes(1, 0)
+        r = 1
+        for rows in batches:
+            for row in rows:
+                ws.write_row(r, 0, row)
+                r += 1
+        wb.close()
+        with open(path, "rb") as f:
+            while chunk := f.read(EXPORT_CHUNK):
+                yield chunk
+    finally:
+        con.close()
+        os.unlink(path)
+
 
 @app.get("/series")
 def series():
@@ -621,32 +768,16 @@ def series():
         # Same max_rank as /uptrends (same filtering semantics)
         max_rank = request.args.get("maxRank", 1_500_000, type=int)
 
-        con = get_conn(read_only=True)
-
-        rows = con.execute("""
-            WITH all_weeks AS (
-              SELECT DISTINCT week FROM searches ORDER BY week
-            ),
-            weeks_idx AS (
-              SELECT week, ROW_NUMBER() OVER (ORDER BY week) AS week_id
-              FROM all_weeks
-            )
-            SELECT w.week, s.rank
-            FROM weeks_idx w
-            LEFT JOIN searches s ON s.week = w.week
-              AND LOWER(TRIM(s.term)) = LOWER(TRIM(?))
-              AND s.rank IS NOT NULL AND s.rank <= ?
-              AND LENGTH(TRIM(s.term)) >= 2 AND LOWER(s.term) <> UPPER(s.term)
-            WHERE w.week_id BETWEEN ? AND ?
-            ORDER BY w.week_id
-        """, [term, max_rank, start_id, end_id]).fetchall()
-
-        con.close()
+        def fetch(con):
+            rows = fetch_series(con, term, start_id, end_id, max_rank)
+            return [
+                {"week": r[0], "weekLabel": r[0], "rank": int(r[1]) if r[1] is not None else None}
+                for r in rows
+            ]
 
-        return jsonify([
-            {"week": r[0], "weekLabel": r[0], "rank": int(r[1]) if r[1] is not None else None}
-            for r in rows
-        ])
+        return _cached_json("series", {
+            "term": term, "start": start_id, "end": end_id, "maxRank": max_rank,
+        }, fetch)
 
     except Exception as e:
         app.logger.exception("series failed")
@@ -718,25 +849,16 @@ def app_demo():
 @app.get("/diag")
 def diag():
     try:
-        con = get_conn(read_only=True)
-        rows  = con.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
-        weeks = con.execute("SELECT COUNT(DISTINCT week) FROM searches").fetchone()[0]
-        sample = con.execute("""
-            SELECT term FROM searches
-            GROUP BY term
-            HAVING NOT (
-              term LIKE '#%' OR
-              REGEXP_MATCHES(term, '^[0-9.eE+\\-]+$') OR
-              LENGTH(TRIM(term)) < 2 OR
-              NOT REGEXP_MATCHES(term, '[A-Za-z]')
-            )
-            LIMIT 5
-        """).fetchall()
+        con = dataset_conn()
+        rows, weeks, sample = fetch_diag(con)
         con.close()
         return jsonify({
             "rows": int(rows),
             "weeks": int(weeks),
-            "sample_clean_terms": [r[0] for r in sample]
+            "dataset": current_version(),
+            "result_cache": result_cache.stats(),
+            "single_flight": query_flights.stats(),
+            "sample_clean_terms": sample
         })
     except Exception as e:
         app.logger.exception("diag failed")
@@ -428,7 +428,16 @@ if (reindexBtn) {
   reindexBtn.addEventListener("click", async ()=>{
     try{
       setLoading(true);
-      await fetchJSON("/reindex");
+      // job arka planda çalışır; bitene kadar durumunu yokla
+      // sync: sadece yeni / değişen haftalık CSV'ler yüklenir
+      let job = await fetchJSON("/reindex?mode=sync");
+      while(job.status === "queued" || job.status === "running"){
+        const files = job.files_total ? ` ${job.files_done}/${job.files_total} files` : "";
+        showToast(`Reindex: ${job.phase}${files}…`, 1500);
+        await new Promise(r => setTimeout(r, 1000));
+        job = await fetchJSON(job.status_url || `/reindex/status/${job.job_id}`);
+      }
+      if(job.status !== "done") throw new Error(job.error || "reindex failed");
       await loadWeeks();
       showToast("Reindex completed.");
     }catch(err){
@@ -0,0 +1,306 @@
+# scripts/bench.py
+"""
+Performans ölçümü: ingest, index yükleme ve temsili sorgu karışımı.
+
+Veri seti yoksa scripts/gen_synthetic_weeks.py ile üretilir; sonuçlar makine
+tarafından okunabilir JSON olarak yazılır (commit, ortam, veri seti, her ölçüm
+için min/median/p95 ms). --compare ile önceki bir sonuç dosyasına göre oranlar
+basılır ve eşik aşılırsa çıkış kodu 1 olur.
+
+Ölçülenler:
+  trend_core  : build_index (soğuk), build_index_cached (soğuk / değişiklik yok),
+                open_index, query_uptrends, query_series
+  duckdb      : init_full, /uptrends (normal + strict), /series, /weeks
+                (Flask test client üzerinden, pro kullanıcı ile)
+
+Kullanım:
+  python scripts/bench.py --root /tmp/bench --terms 200000 --weeks 12
+  python scripts/bench.py --root /tmp/bench --compare bench/<eski>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+
+BENCH_EMAIL = "bench@example.com"
+
+
+# ---------------------------------------------------------------------
+# Yardımcılar
+# ---------------------------------------------------------------------
+def _timeit(fn: Callable, repeat: int, warmup: int = 1) -> Dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "n": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def _once(fn: Callable) -> Dict:
+    t0 = time.perf_counter()
+    fn()
+    ms = round((time.perf_counter() - t0) * 1000, 3)
+    return {"n": 1, "min_ms": ms, "median_ms": ms, "p95_ms": ms, "mean_ms": ms}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def _versions() -> Dict:
+    from importlib.metadata import version
+
+    out = {"python": platform.python_version()}
+    for pkg in ("numpy", "duckdb", "flask"):
+        try:
+            out[pkg] = version(pkg)
+        except Exception:
+            out[pkg] = None
+    return out
+
+
+def _dataset_info(root: Path) -> Dict:
+    files = sorted((root / "data" / "raw").glob("*.csv"))
+    return {
+        "root": str(root),
+        "files": len(files),
+        "bytes": sum(p.stat().st_size for p in files),
+    }
+
+
+# ---------------------------------------------------------------------
+# Sorgu karışımı (veri setinden türetilir, böylece her veri setinde sonuç döner)
+# ---------------------------------------------------------------------
+def _query_mix(idx, n_weeks: int) -> Dict:
+    last = n_weeks
+    windows = sorted({min(w, n_weeks) for w in (2, 4, 6, 12)})
+    # include / exclude kelimeleri: son haftanın en iyi term'lerinin token'ları
+    top = idx.ranks[last - 1]
+    order = [int(t) for t in top.argsort() if top[t] > 0][:50]
+    tokens = []
+    for tid in order:
+        for tok in str(idx.terms[tid]).split():
+            if tok.isalpha() and tok not in tokens:
+                tokens.append(tok)
+    include = tokens[0] if tokens else None
+    exclude = tokens[1] if len(tokens) > 1 else None
+    series_terms = [str(idx.terms[t]) for t in order[:20]]
+
+    cases = []
+    for w in windows:
+        if w < 2:
+            continue
+        start = last - w + 1
+        cases.append({"name": f"w{w}", "start": start, "end": last, "include": None, "exclude": None})
+        cases.append({"name": f"w{w}_incl", "start": start, "end": last, "include": include, "exclude": None})
+        cases.append({"name": f"w{w}_excl", "start": start, "end": last, "include": None, "exclude": exclude})
+    return {"uptrends": cases, "series_terms": series_terms, "series_window": (max(1, last - 5), last)}
+
+
+# ---------------------------------------------------------------------
+# trend_core
+# ---------------------------------------------------------------------
+def bench_trend_core(root: Path, repeat: int, workers: Optional[int]) -> Tuple[Dict, Dict]:
+    from app.core import trend_core
+    from app.core.trend_store import open_index
+
+    results: Dict[str, Dict] = {}
+
+    stats: Dict = {}
+    holder = {}
+    results["trend_core.build_index"] = _once(
+        lambda: holder.setdefault("idx", trend_core.build_index(str(root), workers=workers, stats=stats)))
+    results["trend_core.build_index"]["workers"] = stats.get("workers")
+
+    shutil.rmtree(root / "data" / "store", ignore_errors=True)
+    results["trend_core.build_index_cached.cold"] = _once(
+        lambda: trend_core.build_index_cached(str(root), workers=workers))
+    results["trend_core.build_index_cached.warm"] = _timeit(
+        lambda: trend_core.build_index_cached(str(root)), repeat)
+
+    bins = sorted((root / "data" / "store").glob("index_v*.bin"))
+    if bins:
+        results["trend_core.open_index"] = _timeit(lambda: open_index(bins[-1]), repeat)
+
+    idx = holder["idx"]
+    mix = _query_mix(idx, idx.n_weeks)
+    for case in mix["uptrends"]:
+        for limit in (50, 250):
+            results[f"trend_core.query_uptrends.{case['name']}.l{limit}"] = _timeit(
+                lambda c=case, l=limit: trend_core.query_uptrends(
+                    idx, c["start"], c["end"], include=c["include"], exclude=c["exclude"], limit=l),
+                repeat)
+    s, e = mix["series_window"]
+    results["trend_core.query_series.x20"] = _timeit(
+        lambda: [trend_core.query_series(idx, t, s, e) for t in mix["series_terms"]], repeat)
+    return results, mix
+
+
+# ---------------------------------------------------------------------
+# DuckDB (uygulamanın SQL'i, Flask test client ile)
+# ---------------------------------------------------------------------
+def bench_duckdb(root: Path, repeat: int, mix: Dict) -> Dict:
+    data_dir = root / "data"
+    os.environ["DATA_DIR"] = str(data_dir)
+    for name in ("trends.duckdb", "trends.duckdb.wal"):
+        (data_dir / name).unlink(missing_ok=True)
+    shutil.rmtree(data_dir / "parquet", ignore_errors=True)
+    shutil.rmtree(data_dir / "datasets", ignore_errors=True)
+
+    from app.core import db
+    results: Dict[str, Dict] = {}
+    results["duckdb.init_full"] = _once(lambda: db.init_full(root))
+
+    from app.core.auth import create_user, ensure_users_table, set_plan
+    from app.server.app import app
+
+    ensure_users_table()
+    create_user(BENCH_EMAIL, "bench-password", plan="pro")
+    set_plan(BENCH_EMAIL, "pro")
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_email"] = BENCH_EMAIL
+
+    def get(url: str, params: Dict):
+        r = client.get(url, query_string={k: v for k, v in params.items() if v is not None})
+        if r.status_code != 200:
+            raise RuntimeError(f"{url} {params} -> {r.status_code}: {r.get_data(as_text=True)[:200]}")
+        return r
+
+    results["duckdb.weeks"] = _timeit(lambda: get("/weeks", {}), repeat)
+    for case in mix["uptrends"]:
+        params = {"startWeekId": case["start"], "endWeekId": case["end"],
+                  "include": case["include"], "exclude": case["exclude"], "limit": 250}
+        results[f"duckdb.uptrends.{case['name']}"] = _timeit(lambda p=params: get("/uptrends", p), repeat)
+        results[f"duckdb.uptrends_strict.{case['name']}"] = _timeit(
+            lambda p=params: get("/uptrends", dict(p, strict=1)), repeat)
+    s, e = mix["series_window"]
+    results["duckdb.series.x20"] = _timeit(
+        lambda: [get("/series", {"term": t, "startWeekId": s, "endWeekId": e}) for t in mix["series_terms"]],
+        repeat)
+    return results
+
+
+# ---------------------------------------------------------------------
+# Karşılaştırma
+# ---------------------------------------------------------------------
+def compare(base: Dict, new: Dict, threshold: float, min_ms: float) -> List[str]:
+    """
+    İki sonuç dosyasının median'larını karşılaştırır; eşiği aşanları döner.
+    Her iki tarafı da min_ms altında kalan ölçümler gürültü sayılır, işaretlenmez.
+    """
+    regressions = []
+    print(f"\n{'benchmark':60} {'base ms':>10} {'new ms':>10} {'ratio':>7}")
+    for name, res in new["results"].items():
+        old = base.get("results", {}).get(name)
+        if not old or not old.get("median_ms"):
+            print(f"{name:60} {'-':>10} {res['median_ms']:>10.2f} {'new':>7}")
+            continue
+        ratio = res["median_ms"] / old["median_ms"]
+        slow = ratio > threshold and max(old["median_ms"], res["median_ms"]) >= min_ms
+        flag = "  <-- regression" if slow else ""
+        print(f"{name:60} {old['median_ms']:>10.2f} {res['median_ms']:>10.2f} {ratio:>7.2f}{flag}")
+        if slow:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="trend_core + DuckDB benchmark")
+    ap.add_argument("--root", default="/tmp/amazon-trend-bench", help="veri seti kökü (<root>/data/raw)")
+    ap.add_argument("--terms", type=int, default=100_000, help="veri seti yoksa üretilecek term sayısı")
+    ap.add_argument("--weeks", type=int, default=8, help="veri seti yoksa üretilecek hafta sayısı")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--regenerate", action="store_true", help="mevcut veri setini silip yeniden üret")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=None, help="build_index parse worker sayısı")
+    ap.add_argument("--store", choices=("duckdb", "parquet"), default=None,
+                    help="DuckDB ölçümleri için TREND_STORE (varsayılan: ortamdaki değer)")
+    ap.add_argument("--skip-duckdb", action="store_true")
+    ap.add_argument("--skip-trend-core", action="store_true")
+    ap.add_argument("--out", default=None, help="sonuç JSON (varsayılan: <root>/bench/<commit>.json)")
+    ap.add_argument("--compare", default=None, help="karşılaştırılacak önceki sonuç JSON")
+    ap.add_argument("--threshold", type=float, default=1.25, help="regresyon sayılacak median oranı")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="bunun altındaki ölçümler regresyon sayılmaz")
+    args = ap.parse_args()
+
+    root = Path(args.root).resolve()
+    raw = root / "data" / "raw"
+    if args.regenerate:
+        shutil.rmtree(root / "data", ignore_errors=True)
+    if not any(raw.glob("*.csv")):
+        from gen_synthetic_weeks import generate
+        print(f">> generating dataset: {args.terms} terms x {args.weeks} weeks -> {raw}")
+        generate(str(root), n_terms=args.terms, n_weeks=args.weeks, seed=args.seed)
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": _versions(),
+        "dataset": _dataset_info(root),
+        "repeat": args.repeat,
+        "results": {},
+    }
+
+    from app.core import trend_core
+    idx = trend_core.build_index_cached(str(root))
+    report["dataset"].update({"weeks": idx.n_weeks, "terms": idx.n_terms})
+    mix = _query_mix(idx, idx.n_weeks)
+    del idx
+
+    if not args.skip_trend_core:
+        res, mix = bench_trend_core(root, args.repeat, args.workers)
+        report["results"].update(res)
+    if not args.skip_duckdb:
+        if args.store:
+            os.environ["TREND_STORE"] = args.store
+        report["store"] = os.environ.get("TREND_STORE") or "duckdb"
+        report["results"].update(bench_duckdb(root, args.repeat, mix))
+
+    out = Path(args.out) if args.out else root / "bench" / f"{commit or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n✅ results -> {out}")
+
+    if args.compare:
+        base = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(base, report, args.threshold, args.min_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over x{args.threshold}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
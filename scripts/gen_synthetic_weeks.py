@@ -0,0 +1,186 @@
+# scripts/gen_synthetic_weeks.py
+"""
+Sentetik Brand Analytics verisi üretir (özel veriye ihtiyaç duymadan ölçüm için).
+
+<out>/data/raw altına US_Top_Search_Terms_Simple_Week_YYYY_MM_DD.csv dosyaları yazar:
+  - gerçek export'taki gibi preamble satırı ("Reporting Range=...", "Select week=...")
+  - ek kolonlu başlık (Top Clicked Brand / ASIN / Click Share ...)
+  - tırnak tuhaflıkları: virgüllü ve çift tırnaklı term'ler, formül / sayı / tek harf term'ler
+  - aynı term'in birden fazla satırı (parser en iyi rank'ı almalı)
+  - isteğe bağlı: UTF-16 + TAB dosyalar, binlik ayraçlı rank'lar ("1,234")
+
+Haftalar arası örtüşme Zipf popülerliğinden gelir: her term'in haftalık skoru
+log(popülerlik) + trend + AR(1) gürültü; ilk `coverage` kadarı o haftanın
+listesine girer (Gumbel top-k = popülerliğe orantılı, iadesiz örnekleme).
+Küçük bir kısım (trend_frac) her hafta düzenli yükselir -> uptrend sonuçları boş kalmaz.
+
+Kullanım:
+  python scripts/gen_synthetic_weeks.py /tmp/bench --terms 200000 --weeks 12
+"""
+
+import argparse
+import csv
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+FILE_PREFIX = "US_Top_Search_Terms_Simple_Week_"
+
+HEADER = [
+    "Search Frequency Rank",
+    "Search Term",
+    "Top Clicked Brand #1",
+    "Top Clicked Category #1",
+    "Top Clicked Product #1: ASIN",
+    "Top Clicked Product #1: Product Title",
+    "Top Clicked Product #1: Click Share",
+    "Top Clicked Product #1: Conversion Share",
+]
+
+# Gerçek dosyalarda görülen, filtrelerin elemesi gereken / parser'ı zorlayan term'ler
+QUIRK_TERMS = [
+    "#NAME?", "=SUM(A1)", "12345", "9.78E+12", "a", "!!", "4k",
+    'tv stand 55"', 'he said "hi" shirt', "shoes, women", "kids, toys, gifts",
+    "iPhone 15 Case", "café mug", "t-shirt", "usb-c cable", "  padded  term  ",
+]
+
+_SYLLABLES = [
+    "ka", "lo", "mi", "re", "tu", "sa", "no", "ve", "zi", "po", "da", "fe",
+    "gu", "hi", "jo", "ni", "ra", "te", "be", "co", "lu", "mo", "si", "wa",
+]
+
+
+def _make_words(rng: np.random.Generator, n: int) -> List[str]:
+    words, seen = [], set()
+    while len(words) < n:
+        w = "".join(rng.choice(_SYLLABLES, size=rng.integers(2, 4)))
+        if w not in seen:
+            seen.add(w)
+            words.append(w)
+    return words
+
+
+def make_vocabulary(n_terms: int, seed: int = 1) -> List[str]:
+    """
+    n_terms benzersiz term: 1-4 kelimelik kombinasyonlar. Kelime seçimi de
+    Zipf'li olduğundan bazı token'lar (posting list'ler) çok yoğun olur.
+    """
+    rng = np.random.default_rng(seed)
+    words = _make_words(rng, max(200, int(n_terms ** 0.5) * 4))
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+
+    terms, seen = list(QUIRK_TERMS), set(QUIRK_TERMS)
+    while len(terms) < n_terms:
+        batch = n_terms - len(terms)
+        lengths = rng.integers(1, 5, size=batch)
+        picks = rng.choice(len(words), size=int(lengths.sum()), p=weights)
+        pos = 0
+        for k in lengths:
+            t = " ".join(words[i] for i in picks[pos:pos + k])
+            pos += k
+            if t not in seen:
+                seen.add(t)
+                terms.append(t)
+    return terms[:n_terms]
+
+
+def generate(
+    out_root: str,
+    n_terms: int = 100_000,
+    n_weeks: int = 8,
+    seed: int = 1,
+    zipf: float = 1.07,
+    coverage: float = 0.8,
+    trend_frac: float = 0.02,
+    persistence: float = 0.9,
+    duplicate_frac: float = 0.001,
+    utf16_every: int = 0,
+    thousands_every: int = 0,
+    start: Optional[date] = None,
+) -> List[Path]:
+    """
+    Haftalık CSV'leri üretir, yazılan dosya yollarını döner.
+      coverage:       her hafta listede yer alan term oranı
+      persistence:    haftalar arası gürültü korelasyonu (yüksek = daha fazla örtüşme)
+      utf16_every:    her N. dosya UTF-16 + TAB yazılır (0 = hiç)
+      thousands_every: her N. dosyada rank'lar "1,234" biçiminde yazılır (0 = hiç)
+    """
+    rng = np.random.default_rng(seed)
+    raw = Path(out_root) / "data" / "raw"
+    raw.mkdir(parents=True, exist_ok=True)
+    start = start or date(2024, 1, 6)  # Cumartesi, gerçek hafta sonu tarihleri gibi
+
+    terms = make_vocabulary(n_terms, seed)
+    n = len(terms)
+    log_pop = -zipf * np.log(rng.permutation(n) + 1.0)
+    drift = np.zeros(n)
+    trending = rng.choice(n, size=int(n * trend_frac), replace=False)
+    drift[trending] = rng.uniform(0.3, 1.2, size=len(trending))
+    noise = rng.gumbel(size=n)
+    k = max(1, int(n * coverage))
+    n_dups = int(k * duplicate_frac)
+
+    written: List[Path] = []
+    for w in range(n_weeks):
+        noise = persistence * noise + np.sqrt(1 - persistence ** 2) * rng.gumbel(size=n)
+        score = log_pop + drift * w + noise
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top], kind="stable")]
+
+        dt = start + timedelta(weeks=w)
+        path = raw / f"{FILE_PREFIX}{dt:%Y_%m_%d}.csv"
+        utf16 = utf16_every > 0 and (w + 1) % utf16_every == 0
+        thousands = thousands_every > 0 and (w + 1) % thousands_every == 0
+        dups = rng.choice(k, size=n_dups, replace=False) if n_dups else []
+
+        with open(path, "w", encoding="utf-16" if utf16 else "utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter="\t" if utf16 else ",", quoting=csv.QUOTE_ALL)
+            writer.writerow([
+                "Reporting Range=['Weekly']",
+                f"Select week=['Week {dt.isocalendar()[1]} | {dt - timedelta(days=6)} - {dt}']",
+            ])
+            writer.writerow(HEADER)
+            for r, tid in enumerate(top, 1):
+                writer.writerow(_row(terms[tid], r, thousands))
+            # tekrar eden satırlar daha kötü rank ile (parser MIN(rank) almalı)
+            for pos in dups:
+                writer.writerow(_row(terms[top[pos]], k + 1 + int(pos), thousands))
+            writer.writerow([])  # sondaki boş satır
+        written.append(path)
+        print(f">> {path.name}: {k + n_dups} rows{' (utf-16)' if utf16 else ''}")
+    return written
+
+
+def _row(term: str, rank: int, thousands: bool) -> List[str]:
+    return [f"{rank:,}" if thousands else str(rank), term, "Acme", "Home", "B000000000",
+            f"{term} - product", "12.34", "5.67"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sentetik haftalık Brand Analytics CSV'leri üretir.")
+    ap.add_argument("out_root", help="çıktı kökü; dosyalar <out_root>/data/raw altına yazılır")
+    ap.add_argument("--terms", type=int, default=100_000)
+    ap.add_argument("--weeks", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--zipf", type=float, default=1.07)
+    ap.add_argument("--coverage", type=float, default=0.8)
+    ap.add_argument("--trend-frac", type=float, default=0.02)
+    ap.add_argument("--persistence", type=float, default=0.9)
+    ap.add_argument("--utf16-every", type=int, default=0)
+    ap.add_argument("--thousands-every", type=int, default=0)
+    ap.add_argument("--start", type=date.fromisoformat, default=None, help="ilk hafta (YYYY-MM-DD)")
+    args = ap.parse_args()
+
+    generate(
+        args.out_root, n_terms=args.terms, n_weeks=args.weeks, seed=args.seed,
+        zipf=args.zipf, coverage=args.coverage, trend_frac=args.trend_frac,
+        persistence=args.persistence, utf16_every=args.utf16_every,
+        thousands_every=args.thousands_every, start=args.start,
+    )
+
+
+if __name__ == "__main__":
+    main()